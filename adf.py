@@ -1,16 +1,98 @@
 from lxml import etree
 from iso4217 import Currency
-from typing import Literal, List, Dict
-from datetime import datetime
+from typing import Literal, List, Dict, Tuple, Iterable, AsyncIterator
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import asyncio
+import re
+import sys
 
 # a system that handles the creation, modification, and outputting of adf files
 
 
 
 
+# free text usually comes straight from web forms, and lxml refuses to serialize anything that isn't legal in xml 1.0.
+# sanitizing is opt in (see set_sanitizing()), once enabled every setter that takes free text runs it through sanitize_text()
+
+# everything xml 1.0 doesn't allow: most C0 control characters, surrogates and the two non-characters at the end of the BMP
+_ILLEGAL_CHARS = list(range(0x0, 0x9)) + [0xB, 0xC] + list(range(0xE, 0x20)) + list(range(0xD800, 0xE000)) + [0xFFFE, 0xFFFF]
+
+# whitespace that isn't a plain space (tabs, line breaks, non-breaking and other unicode spaces)
+_WHITESPACE_CHARS = [0x9, 0xA, 0xD, 0x85, 0xA0, 0x1680] + list(range(0x2000, 0x200B)) + [0x2028, 0x2029, 0x202F, 0x205F, 0x3000]
+
+# (replacement, normalize_whitespace) -> translate table
+_translate_tables: Dict[tuple, Dict[int, str]] = {}
+
+# None while sanitizing is off, (replacement, normalize_whitespace) otherwise
+_sanitize_options: tuple | None = None
+
+
+def _translate_table(replacement: str, normalize_whitespace: bool):
+  table = _translate_tables.get((replacement, normalize_whitespace))
+  if table is None:
+    table = dict.fromkeys(_ILLEGAL_CHARS, replacement)
+    if normalize_whitespace:
+      table.update(dict.fromkeys(_WHITESPACE_CHARS, " "))
+    _translate_tables[(replacement, normalize_whitespace)] = table
+  return table
+
+
+# strips (or replaces) characters that can't be put in an xml document. with normalize_whitespace every kind of
+# whitespace becomes a single plain space, and leading/trailing whitespace is dropped
+def sanitize_text(value: str, replacement: str = "", normalize_whitespace: bool = True) -> str:
+  # fast path, printable text has no control characters and no whitespace other than plain spaces
+  if value.isprintable() and (not normalize_whitespace or ("  " not in value and value[:1] != " " and value[-1:] != " ")):
+    return value
+
+  value = value.translate(_translate_table(replacement, normalize_whitespace))
+
+  if normalize_whitespace:
+    value = " ".join(value.split())
+
+  return value
+
+
+def sanitize_many(values: Iterable[str | None], replacement: str = "", normalize_whitespace: bool = True) -> List[str | None]:
+  return [v if v is None else sanitize_text(v, replacement, normalize_whitespace) for v in values]
+
+
+# NOTE: this is process wide, it applies to every model object created or changed after the call
+def set_sanitizing(enabled: bool, replacement: str = "", normalize_whitespace: bool = True):
+  global _sanitize_options
+  _sanitize_options = (replacement, normalize_whitespace) if enabled else None
+
+
+def _clean(value):
+  if _sanitize_options is None or type(value) != str:
+    return value
+  return sanitize_text(value, *_sanitize_options)
+
+
+
+
+# from_xml() goes through the same setters and validation as code building leads by hand, but a value they reject
+# is dropped instead of rejecting the whole lead. the dtd is looser than the setters in places (free text
+# conditions, "voice" phones) and one odd attribute shouldn't cost a lead. returns fn's result, None if it was dropped
+def _lenient(fn, value, *args):
+  if value is None:
+    return None
+  try:
+    return fn(value, *args)
+  except ValueError:
+    return None
+
+
+# "0"/"1" flags, anything else is treated as missing
+def _parsed_flag(text: str | None):
+  return {"0": False, "1": True}.get(text)
+
+
+
+
 class Name:
   def __init__(self, value: str):
-    self.value = value
+    self.value = _clean(value)
     self.part = None
     self.type = None
 
@@ -35,6 +117,16 @@ class Name:
     return self
 
 
+  @staticmethod
+  def from_xml(elem):
+    name = Name(elem.text or "")
+
+    # NOTE: the dtd calls the last name "surname"
+    _lenient(name.set_part, {"surname": "last"}.get(elem.get("part"), elem.get("part")))
+    _lenient(name.set_type, elem.get("type"))
+
+    return name
+
   def to_xml(self):
     elem = etree.Element("name")
     elem.text = self.value
@@ -51,13 +143,21 @@ class Name:
 class Email:
   def __init__(self, value: str):
     # TODO: do we want to include any kind of email validation in this?
-    self.value = value
+    self.value = _clean(value)
     self.is_preferred_contact: bool | None = None
 
   def set_preferred_contact(self, new_value: bool | None):
     self.is_preferred_contact = new_value
     return self
   
+  @staticmethod
+  def from_xml(elem):
+    email = Email(elem.text or "")
+
+    email.set_preferred_contact(_parsed_flag(elem.get("preferredcontact")))
+
+    return email
+  
   def to_xml(self):
     elem = etree.Element("email")
     elem.text = self.value
@@ -70,7 +170,7 @@ class Email:
 
 class PhoneNumber:
   def __init__(self, value: str):
-    self.value = value
+    self.value = _clean(value)
     self.type = None
     self.time = None
     self.is_preferred_contact = None
@@ -99,6 +199,17 @@ class PhoneNumber:
     self.is_preferred_contact = new_value
     return self
 
+  @staticmethod
+  def from_xml(elem):
+    phone_number = PhoneNumber(elem.text or "")
+
+    # NOTE: the dtd's default type is "voice"
+    _lenient(phone_number.set_type, {"voice": "phone"}.get(elem.get("type"), elem.get("type")))
+    _lenient(phone_number.set_time, elem.get("time"))
+    phone_number.set_preferred_contact(_parsed_flag(elem.get("preferredcontact")))
+
+    return phone_number
+
   def to_xml(self):
     elem = etree.Element("phone")
     elem.text = self.value
@@ -136,31 +247,48 @@ class Address:
   # TODO: for now adding them in order is probably fine
   # but going forward this needs to be more ergonomic for consumers
   def add_street(self, street_name: str):
-    self.streets.append(street_name)
+    self.streets.append(_clean(street_name))
     return self
    
   def set_apartment(self, apartment: str):
-    self.apartment = apartment
+    self.apartment = _clean(apartment)
     return self
   
   def set_city(self, city: str):
-    self.city = city
+    self.city = _clean(city)
     return self
   
   # TODO: input validation would be nice
   def set_regioncode(self, regioncode: str):
-    self.regioncode = regioncode
+    self.regioncode = _clean(regioncode)
     return self
   
   def set_postalcode(self, postalcode: str):
-    self.postalcode = postalcode
+    self.postalcode = _clean(postalcode)
     return self
 
   # TODO: input validation would be nice 
   def set_country(self, country: str):
-    self.country = country
+    self.country = _clean(country)
     return self
   
+  @staticmethod
+  def from_xml(elem):
+    address = Address()
+
+    _lenient(address.set_type, elem.get("type"))
+
+    for s in elem.iterfind("street"):
+      address.add_street(s.text or "")
+
+    address.apartment = elem.findtext("apartment")
+    address.city = elem.findtext("city")
+    address.regioncode = elem.findtext("regioncode")
+    address.postalcode = elem.findtext("postalcode")
+    address.country = elem.findtext("country")
+
+    return address
+  
   def to_xml(self):
     elem = etree.Element("address")
 
@@ -195,9 +323,132 @@ class Address:
     return elem
 
 
+# money values (prices, finance amounts and balances) are kept as Decimals. floats go through their shortest repr so
+# 19999.99 stays 19999.99, and with set_money_quantization() every value is rounded to a fixed number of places
+# when it's set, so arithmetic on them (e.g. convert_prices()) can't leave values like 19999.999999 behind
+
+# None keeps values exactly as given, otherwise (quantum, rounding) e.g. (Decimal("0.01"), ROUND_HALF_UP)
+_money_quantization: tuple | None = None
+
+# currency code as given (any case) -> interned iso 4217 code, only ever holds codes that passed validation
+_currency_codes: Dict[str, str] = {}
+
+
+# NOTE: this is process wide like set_sanitizing(), it applies to every money value set after the call
+def set_money_quantization(places: int | None, rounding: str = ROUND_HALF_UP):
+  global _money_quantization
+  _money_quantization = (Decimal(1).scaleb(-places), rounding) if places is not None else None
+
+
+def _to_decimal(value: Decimal | str | int | float, what: str) -> Decimal:
+  if type(value) == float:
+    value = repr(value)
+
+  try:
+    number = Decimal(value.strip() if type(value) == str else value)
+  except (InvalidOperation, TypeError):
+    raise ValueError("must be a valid " + what)
+
+  if not number.is_finite():
+    raise ValueError("must be a valid " + what)
+
+  return number
+
+
+def to_money(value: Decimal | str | int | float) -> Decimal:
+  money = _to_decimal(value, "amount of money")
+
+  # quantize() raises InvalidOperation when the result has more digits than the context allows ("1e30" to cents)
+  if _money_quantization is not None:
+    try:
+      money = money.quantize(*_money_quantization)
+    except InvalidOperation:
+      raise ValueError("amount of money is too large")
+
+  return money
+
+
+# the lenient version for parsed documents. a price without an amount (e.g. type="call") is None, and text that
+# isn't a number ("$19,999") is kept as it was written instead of rejecting the lead
+def _parsed_money(text: str | None) -> Decimal | str | None:
+  if text is None or not text.strip():
+    return None
+  try:
+    return to_money(text)
+  except ValueError:
+    return text
+
+
+def _format_money(value: Decimal | str | None) -> str | None:
+  # parsed values that aren't numbers are written back as they were
+  if type(value) != Decimal:
+    return value
+  # never scientific notation, Decimal("1E+3") is written as 1000
+  return format(value, "f")
+
+
+def currency_code(currency: Currency | str) -> str:
+  if type(currency) != str:
+    return currency.value
+
+  code = _currency_codes.get(currency)
+  if code is None:
+    # raises ValueError for anything that isn't an iso 4217 code
+    code = sys.intern(Currency(currency.strip().upper()).value)
+    _currency_codes[currency] = code
+  return code
+
+
+def _currency_code(currency: Currency | str | None):
+  return None if currency is None else currency_code(currency)
+
+
+# percentage prices aren't amounts of money, and prices without an amount have nothing to convert
+def _convertible(price):
+  return price.value is not None and getattr(price, "delta", None) != "percentage"
+
+
+# converts prices (or finance amounts and balances) to to_currency in place and returns them as a list.
+# rates maps currency codes to what one unit of that currency is worth in to_currency, values without a currency
+# are taken to be in default_currency. percentage prices and prices without an amount are left alone, parsed
+# values that aren't numbers can't be converted and are rejected
+def convert_prices(prices: Iterable,
+                   rates: Dict[Currency | str, Decimal | str | int | float],
+                   to_currency: Currency | str,
+                   default_currency: Currency | str | None = None,
+) -> List:
+  target = currency_code(to_currency)
+  # the rates are validated once for the whole batch instead of per price
+  table = {currency_code(k): _to_decimal(v, "exchange rate") for k, v in rates.items()}
+  table[target] = Decimal(1)
+  default = _currency_code(default_currency)
+
+  result = list(prices)
+  # every value is converted before anything is changed, so a missing rate doesn't leave the batch half converted
+  converted = []
+  for price in result:
+    if not _convertible(price):
+      continue
+    if type(price.value) != Decimal:
+      raise ValueError("can't convert " + repr(price.value) + ", it isn't a number")
+    currency = price.currency or default
+    if currency is None:
+      raise ValueError("price has no currency and there's no default currency")
+    if currency not in table:
+      raise ValueError("no exchange rate for " + currency)
+    rate = table[currency]
+    converted.append((price, price.value if rate == 1 else to_money(price.value * rate)))
+
+  for price, value in converted:
+    price.value = value
+    price.currency = target
+
+  return result
+
+
 class Price:
-    def __init__(self, value: str | int | float):
-        self.value = str(value)
+    def __init__(self, value: Decimal | str | int | float):
+        self.value = to_money(value)
         self.type = None
         self.currency = None
         self.delta = None
@@ -215,12 +466,7 @@ class Price:
         return self
     
     def set_currency(self, currency: Currency | str):
-        if type(currency) == str:
-          # attempt to parse the value
-          cur = Currency(currency.upper())
-          self.currency = cur.value
-        else:
-          self.currency = currency.value
+        self.currency = currency_code(currency)
         return self
     
     def set_delta(self, delta: Literal["absolute", "relative", "percentage"]):
@@ -244,12 +490,26 @@ class Price:
       return self
     
     def set_source(self, source: str):
-       self.source = source
+       self.source = _clean(source)
        return self
     
+    @staticmethod
+    def from_xml(elem):
+        price = Price(0)
+        price.value = _parsed_money(elem.text)
+
+        _lenient(price.set_type, elem.get("type"))
+        _lenient(price.set_currency, elem.get("currency"))
+        _lenient(price.set_delta, elem.get("delta"))
+        _lenient(price.set_relativeto, elem.get("relativeto"))
+        if elem.get("source"):
+          price.set_source(elem.get("source"))
+
+        return price
+    
     def to_xml(self):
         elem = etree.Element("price")
-        elem.text = self.value
+        elem.text = _format_money(self.value)
 
         if self.type:
            elem.set("type", self.type)
@@ -268,18 +528,25 @@ class Price:
 
 class Id:
   def __init__(self, value: str):
-    self.value = value
+    self.value = _clean(value)
     self.sequence = None
     self.source = None
 
   def set_sequence(self, sequence: str):
-    self.sequence = sequence
+    self.sequence = _clean(sequence)
     return self
   
   def set_source(self, source: str):
-    self.source = source
+    self.source = _clean(source)
     return self
 
+  @staticmethod
+  def from_xml(elem):
+    id = Id(elem.text or "")
+    id.sequence = elem.get("sequence")
+    id.source = elem.get("source")
+    return id
+
   def to_xml(self) :
     elem = etree.Element("id")
     if self.sequence:
@@ -322,6 +589,27 @@ class Contact:
     self.addresses.append(address)
     return self
   
+  @staticmethod
+  def from_xml(elem):
+    contact = Contact()
+
+    if _parsed_flag(elem.get("primarycontact")) != None:
+      contact.set_primary_contact(_parsed_flag(elem.get("primarycontact")))
+
+    for n in elem.iterfind("name"):
+      contact.add_name(Name.from_xml(n))
+
+    for e in elem.iterfind("email"):
+      contact.add_email(Email.from_xml(e))
+
+    for p in elem.iterfind("phone"):
+      contact.add_phone_number(PhoneNumber.from_xml(p))
+
+    for a in elem.iterfind("address"):
+      contact.add_address(Address.from_xml(a))
+
+    return contact
+  
   def to_xml(self):
     if len(self.names) == 0:
       raise ValueError("contact must have at least one name")
@@ -350,11 +638,261 @@ class Contact:
 
 
 
+# the vehicle sub-records below are validated once when they're built, so to_xml() can write them out without
+# any further checks. they use __slots__ since vehicles can carry dozens of options
+
+def _optional_int_str(value: int | str | None, what: str):
+  # ints (or strings holding one, e.g. from a parsed document) are stored as the string that ends up in the xml
+  if value is None:
+    return None
+  try:
+    return str(int(value))
+  except (TypeError, ValueError):
+    raise ValueError(what + " must be a whole number")
+
+
+def _choice(value: str | None, valid: tuple, what: str):
+  if value is not None and value not in valid:
+    raise ValueError(what + " must be a valid value")
+  return value
+
+
+_AMOUNT_TYPES = ("downpayment", "monthly", "total")
+_AMOUNT_LIMITS = ("maximum", "minimum", "exact")
+_BALANCE_TYPES = ("finance", "residual")
+_FINANCE_METHODS = ("cash", "finance", "lease")
+
+
+class ColorCombination:
+  __slots__ = ("interior_color", "exterior_color", "preference")
+
+  def __init__(self, interior_color: str | None, exterior_color: str | None, preference: int | None):
+    if interior_color is None and exterior_color is None:
+      raise ValueError("color combination must have an interior or exterior color")
+
+    self.interior_color = _clean(interior_color)
+    self.exterior_color = _clean(exterior_color)
+    self.preference = _optional_int_str(preference, "preference")
+
+  @staticmethod
+  def from_xml(elem):
+    return ColorCombination(elem.findtext("interiorcolor"), elem.findtext("exteriorcolor"), _lenient(_optional_int_str, elem.findtext("preference"), "preference"))
+
+  def to_xml(self):
+    elem = etree.Element("colorcombination")
+
+    if self.interior_color is not None:
+      etree.SubElement(elem, "interiorcolor").text = self.interior_color
+
+    if self.exterior_color is not None:
+      etree.SubElement(elem, "exteriorcolor").text = self.exterior_color
+
+    if self.preference is not None:
+      etree.SubElement(elem, "preference").text = self.preference
+
+    return elem
+
+
+class ImageTag:
+  __slots__ = ("url", "width", "height", "alt_text")
+
+  def __init__(self, url: str, width: int | None = None, height: int | None = None, alt_text: str | None = None):
+    if not url:
+      raise ValueError("image tag must have a url")
+
+    self.url = _clean(url)
+    self.width = _optional_int_str(width, "width")
+    self.height = _optional_int_str(height, "height")
+    self.alt_text = _clean(alt_text)
+
+  @staticmethod
+  def from_xml(elem):
+    return ImageTag(elem.text, _lenient(_optional_int_str, elem.get("width"), "width"),
+                    _lenient(_optional_int_str, elem.get("height"), "height"), elem.get("alttext"))
+
+  def to_xml(self):
+    elem = etree.Element("imagetag")
+    elem.text = self.url
+
+    if self.width is not None:
+      elem.set("width", self.width)
+
+    if self.height is not None:
+      elem.set("height", self.height)
+
+    if self.alt_text is not None:
+      elem.set("alttext", self.alt_text)
+
+    return elem
+
+
+class Option:
+  __slots__ = ("name", "manufacturer_code", "stock", "weighting", "price")
+
+  def __init__(self,
+               name: str,
+               manufacturer_code: str | None = None,
+               stock: str | None = None,
+               weighting: int | None = None,
+               price: Price | None = None,
+  ):
+    if not name:
+      raise ValueError("option must have a name")
+
+    self.name = _clean(name)
+    self.manufacturer_code = _clean(manufacturer_code)
+    self.stock = _clean(stock)
+    self.weighting = _optional_int_str(weighting, "weighting")
+    self.price = price
+
+  @staticmethod
+  def from_xml(elem):
+    price = elem.find("price")
+    return Option(
+      elem.findtext("optionname"),
+      elem.findtext("manufacturercode"),
+      elem.findtext("stock"),
+      _lenient(_optional_int_str, elem.findtext("weighting"), "weighting"),
+      Price.from_xml(price) if price is not None else None,
+    )
+
+  def to_xml(self):
+    elem = etree.Element("option")
+    etree.SubElement(elem, "optionname").text = self.name
+
+    if self.manufacturer_code is not None:
+      etree.SubElement(elem, "manufacturercode").text = self.manufacturer_code
+
+    if self.stock is not None:
+      etree.SubElement(elem, "stock").text = self.stock
+
+    if self.weighting is not None:
+      etree.SubElement(elem, "weighting").text = self.weighting
+
+    if self.price is not None:
+      elem.append(self.price.to_xml())
+
+    return elem
+
+
+class Amount:
+  __slots__ = ("value", "type", "limit", "currency")
+
+  def __init__(self,
+               value: Decimal | str | int | float,
+               type: Literal["downpayment", "monthly", "total"] | None = None,
+               limit: Literal["maximum", "minimum", "exact"] | None = None,
+               currency: Currency | str | None = None,
+  ):
+    self.value = to_money(value)
+    self.type = _choice(type, _AMOUNT_TYPES, "amount type")
+    self.limit = _choice(limit, _AMOUNT_LIMITS, "amount limit")
+    self.currency = _currency_code(currency)
+
+  @staticmethod
+  def from_xml(elem):
+    amount = Amount(
+      0,
+      _lenient(_choice, elem.get("type"), _AMOUNT_TYPES, "amount type"),
+      _lenient(_choice, elem.get("limit"), _AMOUNT_LIMITS, "amount limit"),
+      _lenient(currency_code, elem.get("currency")),
+    )
+    amount.value = _parsed_money(elem.text)
+    return amount
+
+  def to_xml(self):
+    elem = etree.Element("amount")
+    elem.text = _format_money(self.value)
+
+    if self.type is not None:
+      elem.set("type", self.type)
+
+    if self.limit is not None:
+      elem.set("limit", self.limit)
+
+    if self.currency is not None:
+      elem.set("currency", self.currency)
+
+    return elem
+
+
+class Balance:
+  __slots__ = ("value", "type", "currency")
+
+  def __init__(self,
+               value: Decimal | str | int | float,
+               type: Literal["finance", "residual"] | None = None,
+               currency: Currency | str | None = None,
+  ):
+    self.value = to_money(value)
+    self.type = _choice(type, _BALANCE_TYPES, "balance type")
+    self.currency = _currency_code(currency)
+
+  @staticmethod
+  def from_xml(elem):
+    balance = Balance(
+      0,
+      _lenient(_choice, elem.get("type"), _BALANCE_TYPES, "balance type"),
+      _lenient(currency_code, elem.get("currency")),
+    )
+    balance.value = _parsed_money(elem.text)
+    return balance
+
+  def to_xml(self):
+    elem = etree.Element("balance")
+    elem.text = _format_money(self.value)
+
+    if self.type is not None:
+      elem.set("type", self.type)
+
+    if self.currency is not None:
+      elem.set("currency", self.currency)
+
+    return elem
+
+
+class Finance:
+  __slots__ = ("method", "amounts", "balance")
+
+  def __init__(self, method: Literal["cash", "finance", "lease"], amounts: List[Amount], balance: Balance | None = None):
+    if method is None:
+      raise ValueError("finance must have a method")
+
+    self.method = _choice(method, _FINANCE_METHODS, "finance method")
+    self.amounts = list(amounts)
+    self.balance = balance
+
+  @staticmethod
+  def from_xml(elem):
+    balance = elem.find("balance")
+    return Finance(
+      elem.findtext("method"),
+      [Amount.from_xml(a) for a in elem.iterfind("amount")],
+      Balance.from_xml(balance) if balance is not None else None,
+    )
+
+  def to_xml(self):
+    elem = etree.Element("finance")
+    etree.SubElement(elem, "method").text = self.method
+
+    for amount in self.amounts:
+      elem.append(amount.to_xml())
+
+    if self.balance is not None:
+      elem.append(self.balance.to_xml())
+
+    return elem
+
+
+
+
 class Vehicle:
   
   __interest_attr: Literal["buy", "lease", "sell", "trade-in", "test-drive"] | None
   __status_attr: Literal["new", "used"] | None
   __id: Id | None
+  # the dtd allows any number of ids, id is the first one and these are the rest
+  __extra_ids: List[Id]
   __year: str
   __make: str
   __model: str
@@ -370,24 +908,25 @@ class Vehicle:
   # requires further investigation
   __odometer_units_attr: Literal["mi", "km"] | None
   __condition: Literal["excellent", "good", "fair", "poor", "unknown"] | None
-  __color_combinations: List[Dict]
-  __imagetag: Dict
+  __color_combinations: List[ColorCombination]
+  __imagetag: ImageTag | None
   __price: Price | None
   __pricecomments: str | None
-  __options: List[Dict]
-  __finance: Dict
+  __options: List[Option]
+  __finance: Finance | None
   __comments: str | None
 
 
   
   def __init__(self, year: str | int, make: str, model: str):
     self.__year = str(year)
-    self.__make = make
-    self.__model = model
+    self.__make = _clean(make)
+    self.__model = _clean(model)
 
     self.__interest_attr = None
     self.__status_attr = None
     self.__id = None
+    self.__extra_ids = []
     self.__vin = None
     self.__stock = None
     self.__trim = None
@@ -399,11 +938,11 @@ class Vehicle:
     self.__odometer_units_attr = None
     self.__condition = None
     self.__color_combinations = []
-    self.__imagetag = {}
+    self.__imagetag = None
     self.__price = None
     self.__pricecomments = None
     self.__options = []
-    self.__finance = {}
+    self.__finance = None
     self.__comments = None
 
 
@@ -431,32 +970,43 @@ class Vehicle:
     self.__id = id
     return self
 
+  # sets the id if there isn't one yet, adds another one otherwise
+  def add_id(self, id: Id):
+    if self.__id is None:
+      self.__id = id
+    else:
+      self.__extra_ids.append(id)
+    return self
+
+  def get_ids(self):
+    return ([self.__id] if self.__id else []) + self.__extra_ids
+
   def set_vin(self, vin: str):
-    self.__vin = vin
+    self.__vin = _clean(vin)
     return self
   
   def set_stock(self, stock: str):
-    self.__stock = stock
+    self.__stock = _clean(stock)
     return self
   
   def set_trim(self, trim: str):
-    self.__trim = trim
+    self.__trim = _clean(trim)
     return self
   
   def set_doors(self, doors: str):
-    self.__doors = doors
+    self.__doors = _clean(doors)
     return self
   
   def set_bodystyle(self, bodystyle: str):
-    self.__bodystyle = bodystyle
+    self.__bodystyle = _clean(bodystyle)
     return self
   
   def set_transmission(self, transmission: str):
-    self.__transmission = transmission
+    self.__transmission = _clean(transmission)
     return self
   
   def set_odometer(self, odometer: str):
-    self.__odometer = odometer
+    self.__odometer = _clean(odometer)
     return self
   
   def set_odometer_status(self, status: Literal["unknown", "rolledover", "replaced", "original"]):
@@ -493,23 +1043,11 @@ class Vehicle:
 
 
   def add_color_combination(self, interior_color: str | None, exterior_color: str | None, preference: int | None):
-    new_color_combo = {
-      "interiorcolor": interior_color,
-      "exteriorcolor": exterior_color,
-      "preference": str(preference),
-    }
-
-    self.__color_combinations.append(new_color_combo)
+    self.__color_combinations.append(ColorCombination(interior_color, exterior_color, preference))
     return self
 
-  # TODO: needs more value checking
   def set_imagetag(self, image_url: str, width: int | None, height: int | None, alt_text: str | None):
-    self.__imagetag = {
-      "url": image_url,
-      "width": width,
-      "height": height,
-      "alttext": alt_text,
-    }
+    self.__imagetag = ImageTag(image_url, width, height, alt_text)
     return self
 
   def set_price(self, price: Price):
@@ -517,7 +1055,7 @@ class Vehicle:
     return self
   
   def set_price_comment(self, comment: str):
-    self.__pricecomments = comment
+    self.__pricecomments = _clean(comment)
     return self
 
   def add_option(self, 
@@ -527,39 +1065,119 @@ class Vehicle:
                  weighting: int | None,
                  price: Price | None
   ):
-    # TODO: doing it this way makes checking for valid types in to_xml() more cumbersome than it should be
-    # those additional checks should be done here
-    new_option = {
-      "optionname": option_name,
-      "manufacturercode": manufacturer_code,
-      "stock": stock_number,
-      "weighting": str(weighting),
-      "price": price
-    }
-
-    self.__options.append(new_option)
+    self.__options.append(Option(option_name, manufacturer_code, stock_number, weighting, price))
     return self
 
-  # TODO: this is kinda awful, could be really improved
+  # amounts and balance can also be given as the dicts older versions took,
+  # e.g. {"amount": 300, "type": "monthly", "currency": "USD"} and {"balance": 1000, "type": "residual"}
   def set_finance(self, 
                   method: Literal["cash", "finance", "lease"],
-                  amounts: List[Dict], # TODO: this needs to be done better
-                  balance: Dict,
+                  amounts: List[Amount | Dict],
+                  balance: Balance | Dict | None = None,
   ):
-    self.__finance = {
-      "method": method,
-      "amounts": amounts,
-      "balance": balance,
-    }
+    amounts = [a if isinstance(a, Amount) else Amount(a["amount"], a.get("type"), a.get("limit"), a.get("currency")) for a in amounts]
+
+    if type(balance) == dict:
+      balance = Balance(balance["balance"], balance.get("type"), balance.get("currency")) if len(balance) != 0 else None
+
+    self.__finance = Finance(method, amounts, balance)
+    return self
+
+  def add_option_record(self, option: Option):
+    self.__options.append(option)
+    return self
+
+  def add_color_combination_record(self, color_combination: ColorCombination):
+    self.__color_combinations.append(color_combination)
+    return self
+
+  def set_imagetag_record(self, imagetag: ImageTag):
+    self.__imagetag = imagetag
+    return self
+
+  def set_finance_record(self, finance: Finance):
+    self.__finance = finance
     return self
 
 
   def set_comments(self, comments: str):
-    self.__comments = comments
+    self.__comments = _clean(comments)
     return self
 
+  def get_interest(self):
+    return self.__interest_attr
+
+  def get_status(self):
+    return self.__status_attr
+
+  def get_year(self):
+    return self.__year
+
+  def get_make(self):
+    return self.__make
+
+  def get_model(self):
+    return self.__model
+
+  def get_vin(self):
+    return self.__vin
+
+  def get_price(self):
+    return self.__price
+
+  def get_options(self):
+    return self.__options
+
+  def get_finance(self):
+    return self.__finance
+
+
+  @staticmethod
+  def from_xml(elem):
+    vehicle = Vehicle(elem.findtext("year") or "", elem.findtext("make") or "", elem.findtext("model") or "")
 
+    _lenient(vehicle.set_interest, elem.get("interest"))
+    _lenient(vehicle.set_status, elem.get("status"))
 
+    for i in elem.iterfind("id"):
+      vehicle.add_id(Id.from_xml(i))
+
+    vehicle.__vin = elem.findtext("vin")
+    vehicle.__stock = elem.findtext("stock")
+    vehicle.__trim = elem.findtext("trim")
+    vehicle.__doors = elem.findtext("doors")
+    vehicle.__bodystyle = elem.findtext("bodystyle")
+    vehicle.__transmission = elem.findtext("transmission")
+
+    o = elem.find("odometer")
+    if o is not None:
+      vehicle.set_odometer(o.text)
+      _lenient(vehicle.set_odometer_status, o.get("status"))
+      # NOTE: "miles" shows up in the spec's own example
+      _lenient(vehicle.set_odometer_units, o.get("units"))
+
+    # NOTE: the dtd allows any text as the condition, only the values set_condition() knows are kept
+    _lenient(vehicle.set_condition, elem.findtext("condition"))
+
+    # sub-records that can't be built at all (no colors, no url, no option name, unknown finance method) are dropped
+    for c in elem.iterfind("colorcombination"):
+      _lenient(vehicle.add_color_combination_record, _lenient(ColorCombination.from_xml, c))
+
+    _lenient(vehicle.set_imagetag_record, _lenient(ImageTag.from_xml, elem.find("imagetag")))
+
+    if elem.find("price") is not None:
+      vehicle.set_price(Price.from_xml(elem.find("price")))
+
+    vehicle.__pricecomments = elem.findtext("pricecomments")
+
+    for o in elem.iterfind("option"):
+      _lenient(vehicle.add_option_record, _lenient(Option.from_xml, o))
+
+    _lenient(vehicle.set_finance_record, _lenient(Finance.from_xml, elem.find("finance")))
+
+    vehicle.__comments = elem.findtext("comments")
+
+    return vehicle
 
 
   def to_xml(self):
@@ -571,8 +1189,8 @@ class Vehicle:
     if self.__status_attr:
       elem.set("status", self.__status_attr)
 
-    if self.__id:
-      elem.append( self.__id.to_xml() )
+    for id in self.get_ids():
+      elem.append(id.to_xml())
 
     y = etree.SubElement(elem, "year")
     y.text = self.__year
@@ -623,31 +1241,10 @@ class Vehicle:
       c.text = self.__condition
     
     for combo in self.__color_combinations:
-      c = etree.SubElement(elem, "colorcombination")
-      if "interiorcolor" in combo:
-        i = etree.SubElement(c, "interiorcolor")
-        i.text = combo["interiorcolor"]
-      
-      if "exteriorcolor" in combo:
-        e = etree.SubElement(c, "exteriorcolor")
-        e.text = combo["exteriorcolor"]
-      
-      if "preference" in combo:
-        p = etree.SubElement(c, "preference")
-        p.text = combo["preference"]
-      
-    if len(self.__imagetag) != 0:
-      i = etree.SubElement(elem, "imagetag")
-      i.text = self.__imagetag["url"]
-
-      if "width" in self.__imagetag:
-        i.set("width", self.__imagetag["width"])
+      elem.append(combo.to_xml())
       
-      if "height" in self.__imagetag:
-        i.set("height", self.__imagetag["height"])
-      
-      if "alttext" in self.__imagetag:
-        i.set("alttext", self.__imagetag["alttext"])
+    if self.__imagetag:
+      elem.append(self.__imagetag.to_xml())
       
     if self.__price:
       elem.append(self.__price.to_xml())
@@ -657,49 +1254,10 @@ class Vehicle:
       p.text = self.__pricecomments
     
     for option in self.__options:
-      o = etree.SubElement(elem, "option")
-
-      if "optionname" in option:
-        n = etree.SubElement(o, "optionname")
-        n.text = option["optionname"]
-      
-      if "manufacturercode" in option:
-        c = etree.SubElement(o, "manufacturercode")
-        c.text = option["manufacturercode"]
-      
-      if "stock" in option:
-        s = etree.SubElement(o, "stock")
-        s.text = option["stock"]
-      
-      if "weighting" in option:
-        w = etree.SubElement(o, "weighting")
-        w.text = option["weighting"]
+      elem.append(option.to_xml())
       
-      if "price" in option:
-        o.append( option["price"].to_xml() )
-      
-    if len(self.__finance) != 0:
-      f = etree.SubElement(elem, "finance")
-
-      if "method" in self.__finance:
-        m = etree.SubElement(f, "method")
-        m.text = self.__finance["method"]
-
-      for amount in self.__finance["amounts"]:
-        a = etree.SubElement(f, "amount")
-        a.text = str(amount["amount"])
-
-        if "type" in amount:
-          a.set("type", amount["type"])
-        
-        if "currency" in amount:
-          a.set("currency", amount["currency"])
-
-      if "balance" in self.__finance:
-        b = etree.SubElement(f, "balance")
-        b.text = str(self.__finance["balance"]["balance"])
-        b.set("type", self.__finance["balance"]["type"])
-        b.set("currency", self.__finance["balance"]["currency"])
+    if self.__finance:
+      elem.append(self.__finance.to_xml())
 
     if self.__comments:
       c = etree.SubElement(elem, "comments")
@@ -717,55 +1275,96 @@ class Customer:
     
     __contact: Contact
     __id: Id | None
+    __extra_ids: List[Id]
     __comments: str | None
     __timeframe : Dict
 
     def __init__(self, contact: Contact):
       self.__contact = contact
       self.__id = None
+      self.__extra_ids = []
       self.__comments = None
       self.__timeframe = {}
 
     def set_id(self, id: Id):
       self.__id = id
       return self
-    
+
+    # sets the id if there isn't one yet, adds another one otherwise
+    def add_id(self, id: Id):
+      if self.__id is None:
+        self.__id = id
+      else:
+        self.__extra_ids.append(id)
+      return self
+
+    def get_ids(self):
+      return ([self.__id] if self.__id else []) + self.__extra_ids
+
     def set_comments(self, comments: str):
-      self.__comments = comments
+      self.__comments = _clean(comments)
       return self
+
+    def get_contact(self):
+      return self.__contact
     
+    # TODO: the adf spec says that earliestdate and/or latestdate are required, but in the same document
+    # they break this requirement, so a timeframe with only a description is allowed too
     def set_timeframe(self, earliest_date: datetime | None, latest_date: datetime | None, description: str | None):
+      if earliest_date is None and latest_date is None and not _clean(description):
+        raise ValueError("timeframe needs an earliestdate, a latestdate or a description")
       self.__timeframe["earliestdate"] = earliest_date
       self.__timeframe["latestdate"] = latest_date
-      self.__timeframe["description"] = description
+      self.__timeframe["description"] = _clean(description)
       return self
 
 
+    @staticmethod
+    def from_xml(elem):
+      c = elem.find("contact")
+      if c is None:
+        raise ValueError("customer must have a contact")
+
+      customer = Customer(Contact.from_xml(c))
+
+      for i in elem.iterfind("id"):
+        customer.add_id(Id.from_xml(i))
+
+      t = elem.find("timeframe")
+      if t is not None:
+        try:
+          customer.set_timeframe(
+            _lenient(datetime.fromisoformat, t.findtext("earliestdate") or None),
+            _lenient(datetime.fromisoformat, t.findtext("latestdate") or None),
+            t.findtext("description"),
+          )
+        except ValueError:
+          pass
+
+      customer.__comments = elem.findtext("comments")
+
+      return customer
+
     def to_xml(self):
       elem = etree.Element("customer")
 
       elem.append( self.__contact.to_xml() )
 
-      if self.__id:
-        elem.append(self.__id.to_xml())
+      for id in self.get_ids():
+        elem.append(id.to_xml())
       
       if len(self.__timeframe) != 0:
-        # TODO: the adf spec says that this is a requirement, but in the same document they break this requirement
-        # needs further investigation
-        if self.__timeframe["earliestdate"] == None or self.__timeframe["latestdate"] == None:
-          raise ValueError("if timeframe tag is present, it is required to specify earliestdate and/or latestdate")
-
         t = etree.SubElement(elem, "timeframe")
 
-        if "earliestdate" in self.__timeframe:
+        if self.__timeframe["earliestdate"] is not None:
           ed = etree.SubElement(t, "earliestdate")
           ed.text = self.__timeframe["earliestdate"].replace(microsecond=0).isoformat()
         
-        if "latestdate" in self.__timeframe:
+        if self.__timeframe["latestdate"] is not None:
           ld = etree.SubElement(t, "latestdate")
           ld.text = self.__timeframe["latestdate"].replace(microsecond=0).isoformat()
 
-        if "description" in self.__timeframe:
+        if self.__timeframe["description"]:
           d = etree.SubElement(t, "description")
           d.text = self.__timeframe["description"]
 
@@ -780,29 +1379,63 @@ class Customer:
 class Vendor:
     
     __id: Id | None
+    __extra_ids: List[Id]
     __vendor_name: str
     __url: str | None
     __contact: Contact
 
     def __init__(self, vendor_name: str, contact: Contact):
-      self.__vendor_name = vendor_name
+      self.__vendor_name = _clean(vendor_name)
       self.__contact = contact
       self.__id = None
+      self.__extra_ids = []
       self.__url = None
 
     def set_id(self, id: Id):
       self.__id = id
       return self
-    
+
+    # sets the id if there isn't one yet, adds another one otherwise
+    def add_id(self, id: Id):
+      if self.__id is None:
+        self.__id = id
+      else:
+        self.__extra_ids.append(id)
+      return self
+
+    def get_ids(self):
+      return ([self.__id] if self.__id else []) + self.__extra_ids
+
     def set_url(self, url: str):
-      self.__url = url
+      self.__url = _clean(url)
       return self
+
+    def get_id(self):
+      return self.__id
+
+    def get_vendor_name(self):
+      return self.__vendor_name
+    
+    @staticmethod
+    def from_xml(elem):
+      c = elem.find("contact")
+      if c is None:
+        raise ValueError("vendor must have a contact")
+
+      vendor = Vendor(elem.findtext("vendorname") or "", Contact.from_xml(c))
+
+      for i in elem.iterfind("id"):
+        vendor.add_id(Id.from_xml(i))
+
+      vendor.__url = elem.findtext("url")
+
+      return vendor
     
     def to_xml(self):
       elem = etree.Element("vendor")
 
-      if self.__id:
-        elem.append(self.__id.to_xml())
+      for id in self.get_ids():
+        elem.append(id.to_xml())
 
       vn = etree.SubElement(elem, "vendorname")
       vn.text = self.__vendor_name
@@ -819,6 +1452,8 @@ class Vendor:
 class Provider:
   def __init__(self):
     self.id: Id | None = None
+    # the dtd allows any number of ids, id is the first one and these are the rest
+    self.extra_ids: List[Id] = []
     self.names: List[Name] = []
     self.service: str | None = None
     self.url: str | None = None
@@ -830,16 +1465,27 @@ class Provider:
     self.id = id
     return self
 
+  # sets the id if there isn't one yet, adds another one otherwise
+  def add_id(self, id: Id):
+    if self.id is None:
+      self.id = id
+    else:
+      self.extra_ids.append(id)
+    return self
+
+  def get_ids(self):
+    return ([self.id] if self.id else []) + self.extra_ids
+
   def add_name(self, name: Name):
     self.names.append(name)
     return self
   
   def set_service(self, service: str):
-    self.service = service
+    self.service = _clean(service)
     return self
   
   def set_url(self, url: str):
-    self.url = url
+    self.url = _clean(url)
     return self
   
   def add_email(self, email: Email):
@@ -854,6 +1500,30 @@ class Provider:
     self.contact = contact
     return self
 
+  @staticmethod
+  def from_xml(elem):
+    provider = Provider()
+
+    for i in elem.iterfind("id"):
+      provider.add_id(Id.from_xml(i))
+
+    for n in elem.iterfind("name"):
+      provider.add_name(Name.from_xml(n))
+
+    provider.service = elem.findtext("service")
+    provider.url = elem.findtext("url")
+
+    for e in elem.iterfind("email"):
+      provider.add_email(Email.from_xml(e))
+
+    for p in elem.iterfind("phone"):
+      provider.add_phone_number(PhoneNumber.from_xml(p))
+
+    if elem.find("contact") is not None:
+      provider.set_contact(Contact.from_xml(elem.find("contact")))
+
+    return provider
+
   def to_xml(self):
     
     if len(self.names) == 0:
@@ -862,8 +1532,8 @@ class Provider:
     elem = etree.Element("provider")
 
 
-    if self.id:
-      elem.append( self.id.to_xml() )
+    for id in self.get_ids():
+      elem.append(id.to_xml())
 
     for n in self.names:
       elem.append(n.to_xml())
@@ -894,9 +1564,29 @@ class Provider:
 
 
 
+# the forms customer emails and phone numbers are compared in, anything matching the same customer across leads
+# (the lead store's indexes, the metrics' distinct counts) has to go through these so they agree on who's who
+def normalize_email(email: str) -> str:
+  return email.strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+  return re.sub(r"\D", "", phone)
+
+
+# request dates may or may not carry an offset, and the two kinds can't be compared. anything that orders or
+# buckets leads by date converts them with this first, naive dates are taken to be utc
+def _to_utc(date: datetime) -> datetime:
+  if date.tzinfo is None:
+    return date.replace(tzinfo=timezone.utc)
+  return date.astimezone(timezone.utc)
+
+
 class Prospect:
 
+    __status_attr: Literal["new", "resend"] | None
     __id: Id | None
+    __extra_ids: List[Id]
     __request_date: datetime | None
     __vehicles: List[Vehicle]
     __customer: Customer | None
@@ -904,17 +1594,40 @@ class Prospect:
     __provider: Provider | None
 
     def __init__(self):
+      self.__status_attr = None
       self.__id = None
+      self.__extra_ids = []
       self.__request_date = None
       self.__vehicles = []
       self.__customer = None
       self.__vendor = None
       self.__provider = None
 
+    def set_status(self, status: Literal["new", "resend"]):
+      # NOTE: this is technically duplication. I think it's small enough to be fine but it may need to be changed later
+      valid_statuses = ["new", "resend"]
+
+      if not status in valid_statuses:
+        raise ValueError("status must be a valid value")
+
+      self.__status_attr = status
+      return self
+
     def set_id(self, id: Id):
       self.__id = id
       return self
 
+    # sets the id if there isn't one yet, adds another one otherwise
+    def add_id(self, id: Id):
+      if self.__id is None:
+        self.__id = id
+      else:
+        self.__extra_ids.append(id)
+      return self
+
+    def get_ids(self):
+      return ([self.__id] if self.__id else []) + self.__extra_ids
+
     def set_request_date(self, requestdate: datetime):
       self.__request_date = requestdate
       return self
@@ -934,12 +1647,65 @@ class Prospect:
     def set_provider(self, provider: Provider):
       self.__provider = provider
       return self
+
+    def get_status(self):
+      return self.__status_attr
+
+    def get_id(self):
+      return self.__id
+
+    def get_request_date(self):
+      return self.__request_date
+
+    def get_vehicles(self):
+      return self.__vehicles
+
+    def get_customer(self):
+      return self.__customer
+
+    def get_vendor(self):
+      return self.__vendor
+
+    def get_provider(self):
+      return self.__provider
+
+    # compares this prospect against a newer version of the same lead, see diff()
+    def diff(self, new: "Prospect"):
+      return diff(self, new)
+    
+    @staticmethod
+    def from_xml(elem):
+      prospect = Prospect()
+
+      _lenient(prospect.set_status, elem.get("status"))
+
+      for i in elem.iterfind("id"):
+        prospect.add_id(Id.from_xml(i))
+
+      _lenient(prospect.set_request_date, _lenient(datetime.fromisoformat, elem.findtext("requestdate") or None))
+
+      for v in elem.iterfind("vehicle"):
+        prospect.add_vehicle(Vehicle.from_xml(v))
+
+      if elem.find("customer") is not None:
+        prospect.set_customer(Customer.from_xml(elem.find("customer")))
+
+      if elem.find("vendor") is not None:
+        prospect.set_vendor(Vendor.from_xml(elem.find("vendor")))
+
+      if elem.find("provider") is not None:
+        prospect.set_provider(Provider.from_xml(elem.find("provider")))
+
+      return prospect
     
     def to_xml(self):
       elem = etree.Element("prospect")
 
-      if self.__id:
-        elem.append(self.__id.to_xml())
+      if self.__status_attr:
+        elem.set("status", self.__status_attr)
+
+      for id in self.get_ids():
+        elem.append(id.to_xml())
 
       if self.__request_date:
         r = etree.SubElement(elem, "requestdate")
@@ -971,9 +1737,26 @@ class Adf:
         self.__prospect = prospect
 
     @staticmethod
-    def from_xml_str(xml: str):
-      pass
+    def from_xml(elem):
+      p = elem.find("prospect")
+      if p is None:
+        raise ValueError("adf must have at least one prospect")
+
+      # NOTE: the spec allows more than one prospect per document, but Adf only holds one.
+      # use iter_prospects() to read all of them
+      return Adf(Prospect.from_xml(p))
+
+    @staticmethod
+    def from_xml_str(xml: str | bytes):
+      # lxml refuses str input that carries an encoding declaration, so always hand it bytes
+      if type(xml) == str:
+        xml = xml.encode("utf-8")
+
+      return Adf.from_xml(etree.fromstring(xml, _xml_parser()))
     
+    def get_prospect(self):
+      return self.__prospect
+
     def to_xml(self):
       elem = etree.Element("adf")
 
@@ -981,6 +1764,158 @@ class Adf:
 
       return elem
 
-    
 
 
+
+# strips the name mangling off private attributes so model objects can be walked generically
+def _fields(obj) -> Dict:
+  if hasattr(type(obj), "__slots__"):
+    return {k: getattr(obj, k) for k in type(obj).__slots__}
+
+  prefix = "_" + type(obj).__name__ + "__"
+  return {(k[len(prefix):] if k.startswith(prefix) else k): v for k, v in vars(obj).items()}
+
+
+_MODEL_TYPES = (
+  Name, Email, PhoneNumber, Address, Price, Id, Contact,
+  ColorCombination, ImageTag, Option, Amount, Balance, Finance,
+  Vehicle, Customer, Vendor, Provider, Prospect, Adf,
+)
+
+# fields that describe the delivery rather than the lead itself, so they never count as a change
+_DIFF_IGNORED = {(Prospect, "status_attr")}
+
+
+def _diff(old, new, path: str, changes: Dict, seen: set):
+  # the same object on both sides can't have changed, which lets shared subtrees be skipped entirely
+  if old is new:
+    return
+
+  if type(old) != type(new):
+    changes[path] = (old, new)
+    return
+
+  if isinstance(old, _MODEL_TYPES):
+    # a pair that was already compared through another reference doesn't need to be walked again
+    if (id(old), id(new)) in seen:
+      return
+    seen.add((id(old), id(new)))
+
+    old_fields = _fields(old)
+    new_fields = _fields(new)
+    for name in old_fields:
+      if (type(old), name) in _DIFF_IGNORED:
+        continue
+      _diff(old_fields[name], new_fields[name], path + "." + name if path else name, changes, seen)
+
+  elif isinstance(old, list):
+    for i in range(max(len(old), len(new))):
+      _diff(old[i] if i < len(old) else None, new[i] if i < len(new) else None, path + "[" + str(i) + "]", changes, seen)
+
+  elif isinstance(old, dict):
+    for key in list(old) + [k for k in new if k not in old]:
+      _diff(old.get(key), new.get(key), path + "[" + repr(key) + "]", changes, seen)
+
+  elif isinstance(old, Decimal):
+    # 25000 == 25000.00 as Decimals, but they're written out differently so the receiver sees a change
+    if _format_money(old) != _format_money(new):
+      changes[path] = (old, new)
+
+  elif old != new:
+    changes[path] = (old, new)
+
+
+# walks two versions of a model object field by field and returns {path: (old value, new value)} for everything that changed.
+# an empty result means the new version doesn't need to be resent, otherwise mark it with new.set_status("resend")
+def diff(old, new) -> Dict[str, tuple]:
+  changes = {}
+  _diff(old, new, "", changes, set())
+  return changes
+
+
+# lead documents come from outside sources, so entities are never expanded
+def _xml_parser():
+  return etree.XMLParser(resolve_entities=False)
+
+
+# incrementally parses an adf document that arrives in chunks (sockets, chunked uploads, ...)
+# and hands back every prospect as soon as its closing tag has been read
+class ProspectFeedParser:
+
+  def __init__(self):
+    self.__parser = etree.XMLPullParser(events=("end",), tag="prospect", resolve_entities=False)
+    self.__count = 0
+    # (position of the prospect in the feed, error) for every prospect that couldn't be read. those are skipped
+    # so one bad lead doesn't take the rest of the feed down with it
+    self.errors: List[Tuple[int, ValueError]] = []
+
+  def __read_events(self):
+    prospects: List[Prospect] = []
+
+    for _, elem in self.__parser.read_events():
+      try:
+        prospects.append(Prospect.from_xml(elem))
+      except ValueError as e:
+        self.errors.append((self.__count, e))
+      self.__count += 1
+
+      # drop everything that has already been turned into a prospect so memory stays flat on large documents
+      elem.clear(keep_tail=True)
+      while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+    return prospects
+
+  def feed(self, data: bytes | str) -> List[Prospect]:
+    self.__parser.feed(data)
+    return self.__read_events()
+
+  def close(self) -> List[Prospect]:
+    # raises etree.XMLSyntaxError if the document was cut off
+    self.__parser.close()
+    return self.__read_events()
+
+
+def _raise_first(errors: List[Tuple[int, ValueError]]):
+  if errors:
+    position, error = errors[0]
+    raise ValueError("prospect " + str(position) + ": " + str(error) + " (" + str(len(errors)) + " invalid prospects)")
+
+
+# yields every prospect that could be read. invalid prospects are appended to errors as (position, error) if it's
+# given, otherwise the first one is raised once every valid prospect has been yielded
+def iter_prospects(chunks: Iterable[bytes | str], errors: List[Tuple[int, ValueError]] | None = None):
+  parser = ProspectFeedParser()
+  if errors is not None:
+    parser.errors = errors
+
+  for chunk in chunks:
+    yield from parser.feed(chunk)
+
+  yield from parser.close()
+
+  if errors is None:
+    _raise_first(parser.errors)
+
+
+async def aiter_prospects(reader: asyncio.StreamReader,
+                          chunk_size: int = 64 * 1024,
+                          errors: List[Tuple[int, ValueError]] | None = None,
+) -> AsyncIterator[Prospect]:
+  parser = ProspectFeedParser()
+  if errors is not None:
+    parser.errors = errors
+
+  while True:
+    chunk = await reader.read(chunk_size)
+    if not chunk:
+      break
+
+    for prospect in parser.feed(chunk):
+      yield prospect
+
+  for prospect in parser.close():
+    yield prospect
+
+  if errors is None:
+    _raise_first(parser.errors)
@@ -0,0 +1,373 @@
+from typing import Dict, List
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from adf import Name, Email, PhoneNumber, Address, Price, Id, Contact, Vehicle, Customer, Vendor, Provider, Prospect, Adf
+from adf import ColorCombination, ImageTag, Option, Amount, Balance, Finance
+
+# a compact binary encoding of the model objects for passing leads between internal services.
+# objects are written as (field tag, value) pairs following SCHEMA, numbers as varints and
+# the strings that show up in almost every lead (enum values, currencies) as an index into _INTERNED.
+#
+# NOTE: this is a wire format. SCHEMA field order, _CLASSES and _INTERNED may only ever be appended to,
+# anything else needs a new _VERSION
+
+
+
+
+_MAGIC = 0xAD
+_VERSION = 1
+
+# the model classes in class id order
+_CLASSES = [
+  Name, Email, PhoneNumber, Address, Price, Id, Contact, Vehicle, Customer, Vendor, Provider, Prospect, Adf,
+  ColorCombination, ImageTag, Option, Amount, Balance, Finance,
+]
+
+# the fields of every class, tag = position + 1
+SCHEMA: Dict[type, List[str]] = {
+  Name: ["value", "part", "type"],
+  Email: ["value", "is_preferred_contact"],
+  PhoneNumber: ["value", "type", "time", "is_preferred_contact"],
+  Address: ["address_type", "streets", "apartment", "city", "regioncode", "postalcode", "country"],
+  Price: ["value", "type", "currency", "delta", "relativeto", "source"],
+  Id: ["value", "sequence", "source"],
+  Contact: ["is_primary_contact", "names", "emails", "phone_numbers", "addresses"],
+  Vehicle: [
+    "interest_attr", "status_attr", "id", "extra_ids", "year", "make", "model", "vin", "stock", "trim", "doors",
+    "bodystyle", "transmission", "odometer", "odometer_status_attr", "odometer_units_attr", "condition",
+    "color_combinations", "imagetag", "price", "pricecomments", "options", "finance", "comments",
+  ],
+  Customer: ["contact", "id", "extra_ids", "comments", "timeframe"],
+  Vendor: ["id", "extra_ids", "vendor_name", "url", "contact"],
+  Provider: ["id", "extra_ids", "names", "service", "url", "emails", "phone_numbers", "contact"],
+  Prospect: ["status_attr", "id", "extra_ids", "request_date", "vehicles", "customer", "vendor", "provider"],
+  Adf: ["prospect"],
+  ColorCombination: ["interior_color", "exterior_color", "preference"],
+  ImageTag: ["url", "width", "height", "alt_text"],
+  Option: ["name", "manufacturer_code", "stock", "weighting", "price"],
+  Amount: ["value", "type", "limit", "currency"],
+  Balance: ["value", "type", "currency"],
+  Finance: ["method", "amounts", "balance"],
+}
+
+# classes that keep their fields in name mangled attributes
+_PRIVATE = {Vehicle, Customer, Vendor, Prospect, Adf}
+
+_INTERNED = [
+  # Name
+  "first", "middle", "suffix", "last", "full", "individual", "business",
+  # PhoneNumber
+  "phone", "fax", "cellphone", "pager", "morning", "afternoon", "evening", "nopreference", "day",
+  # Address
+  "work", "home", "delivery",
+  # Price
+  "quote", "offer", "msrp", "invoice", "call", "appraisal", "asking", "absolute", "relative", "percentage",
+  # Vehicle
+  "buy", "lease", "sell", "trade-in", "test-drive", "new", "used", "unknown", "rolledover", "replaced", "original",
+  "mi", "km", "excellent", "good", "fair", "poor",
+  # Amount, Balance and Finance
+  "downpayment", "monthly", "total", "maximum", "minimum", "exact", "finance", "residual", "cash",
+  # Customer timeframe keys
+  "earliestdate", "latestdate", "description",
+  # Prospect
+  "resend",
+  # common currencies
+  "USD", "CAD", "EUR", "GBP", "MXN",
+]
+
+# class ids, field tags and interned string indexes are written as a single byte
+assert len(_INTERNED) < 0x80 and len(_CLASSES) < 0x80 and max(map(len, SCHEMA.values())) < 0x80
+_INTERNED_INDEX = {s: i for i, s in enumerate(_INTERNED)}
+
+# (class id, [(tag, attribute name)], slotted) for encoding and (class, attribute names in tag order, slotted) for decoding
+_ENCODE_PLAN: Dict[type, tuple] = {}
+_DECODE_PLAN: List[tuple] = []
+
+for _class_id, _cls in enumerate(_CLASSES):
+  _prefix = "_" + _cls.__name__ + "__" if _cls in _PRIVATE else ""
+  _attrs = [_prefix + f for f in SCHEMA[_cls]]
+  _slotted = hasattr(_cls, "__slots__")
+  _ENCODE_PLAN[_cls] = (_class_id, list(enumerate(_attrs, 1)), _slotted)
+  _DECODE_PLAN.append((_cls, _attrs, _slotted))
+
+
+_NONE = 0
+_STR = 1
+_INTERNED_STR = 2
+_INT = 3
+_TRUE = 4
+_FALSE = 5
+_LIST = 6
+_DICT = 7
+_OBJECT = 8
+_DATETIME = 9
+_FLOAT = 10
+_DECIMAL = 11
+
+
+
+
+def _write_varint(out: bytearray, n: int):
+  if n < 0x80:
+    out.append(n)
+    return
+
+  while n > 0x7f:
+    out.append((n & 0x7f) | 0x80)
+    n >>= 7
+  out.append(n)
+
+
+def _write_str(out: bytearray, value: str):
+  i = _INTERNED_INDEX.get(value)
+  if i != None:
+    out.append(_INTERNED_STR)
+    out.append(i)
+    return
+
+  b = value.encode("utf-8")
+  out.append(_STR)
+  _write_varint(out, len(b))
+  out += b
+
+
+# the hot path. every field value that's a string, a list or another model object is written right here instead of
+# going through _write()'s chain of type checks, which is most of them in a typical lead
+def _write_object(out: bytearray, value):
+  class_id, fields, slotted = _ENCODE_PLAN[type(value)]
+  out.append(_OBJECT)
+  out.append(class_id)
+  attrs = value.__dict__ if not slotted else None
+  for tag, attr in fields:
+    v = attrs[attr] if not slotted else getattr(value, attr)
+    # unset fields are simply left out, decode() defaults them to None
+    if v is None:
+      continue
+    out.append(tag)
+    t = type(v)
+    if t is str:
+      i = _INTERNED_INDEX.get(v)
+      if i != None:
+        out.append(_INTERNED_STR)
+        out.append(i)
+      else:
+        b = v.encode("utf-8")
+        out.append(_STR)
+        n = len(b)
+        if n < 0x80:
+          out.append(n)
+        else:
+          _write_varint(out, n)
+        out += b
+    elif t is list:
+      out.append(_LIST)
+      n = len(v)
+      if n < 0x80:
+        out.append(n)
+      else:
+        _write_varint(out, n)
+      for item in v:
+        if type(item) in _ENCODE_PLAN:
+          _write_object(out, item)
+        else:
+          _write(out, item)
+    elif t in _ENCODE_PLAN:
+      _write_object(out, v)
+    else:
+      _write(out, v)
+  out.append(0)
+
+
+def _write(out: bytearray, value):
+  t = type(value)
+
+  if t in _ENCODE_PLAN:
+    _write_object(out, value)
+  elif t is str:
+    _write_str(out, value)
+  elif value is None:
+    out.append(_NONE)
+  elif t is bool:
+    out.append(_TRUE if value else _FALSE)
+  elif t is int:
+    out.append(_INT)
+    # zigzag so small negative numbers stay small
+    _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+  elif t is list:
+    out.append(_LIST)
+    _write_varint(out, len(value))
+    for v in value:
+      _write(out, v)
+  elif t is dict:
+    out.append(_DICT)
+    _write_varint(out, len(value))
+    for k, v in value.items():
+      _write(out, k)
+      _write(out, v)
+  elif t is datetime:
+    out.append(_DATETIME)
+    b = value.isoformat().encode("ascii")
+    _write_varint(out, len(b))
+    out += b
+  elif t is float:
+    out.append(_FLOAT)
+    b = repr(value).encode("ascii")
+    _write_varint(out, len(b))
+    out += b
+  elif t is Decimal:
+    out.append(_DECIMAL)
+    b = str(value).encode("ascii")
+    _write_varint(out, len(b))
+    out += b
+  else:
+    raise ValueError("can't encode values of type " + t.__name__)
+
+
+def _read_varint(data: bytes, pos: int):
+  n = 0
+  shift = 0
+  while True:
+    b = data[pos]
+    pos += 1
+    n |= (b & 0x7f) << shift
+    if b < 0x80:
+      return n, pos
+    shift += 7
+
+
+def _read(data: bytes, pos: int):
+  kind = data[pos]
+  pos += 1
+
+  if kind == _INTERNED_STR:
+    i, pos = _read_varint(data, pos)
+    return _INTERNED[i], pos
+  if kind == _STR:
+    n, pos = _read_varint(data, pos)
+    return data[pos:pos + n].decode("utf-8"), pos + n
+  if kind == _NONE:
+    return None, pos
+  if kind == _OBJECT:
+    class_id, pos = _read_varint(data, pos)
+    cls, attrs, slotted = _DECODE_PLAN[class_id]
+    obj = cls.__new__(cls)
+    fields = dict.fromkeys(attrs)
+    while True:
+      tag = data[pos]
+      pos += 1
+      if tag == 0:
+        break
+      # same string fast path as the encoder
+      kind = data[pos]
+      if kind == _STR and data[pos + 1] < 0x80:
+        end = pos + 2 + data[pos + 1]
+        fields[attrs[tag - 1]] = data[pos + 2:end].decode("utf-8")
+        pos = end
+      elif kind == _INTERNED_STR and data[pos + 1] < 0x80:
+        fields[attrs[tag - 1]] = _INTERNED[data[pos + 1]]
+        pos += 2
+      else:
+        fields[attrs[tag - 1]], pos = _read(data, pos)
+    if slotted:
+      for k, v in fields.items():
+        setattr(obj, k, v)
+    else:
+      obj.__dict__ = fields
+    return obj, pos
+  if kind == _LIST:
+    n, pos = _read_varint(data, pos)
+    values = []
+    for _ in range(n):
+      v, pos = _read(data, pos)
+      values.append(v)
+    return values, pos
+  if kind == _DICT:
+    n, pos = _read_varint(data, pos)
+    values = {}
+    for _ in range(n):
+      k, pos = _read(data, pos)
+      values[k], pos = _read(data, pos)
+    return values, pos
+  if kind == _TRUE:
+    return True, pos
+  if kind == _FALSE:
+    return False, pos
+  if kind == _INT:
+    n, pos = _read_varint(data, pos)
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+  if kind == _DATETIME:
+    n, pos = _read_varint(data, pos)
+    return datetime.fromisoformat(data[pos:pos + n].decode("ascii")), pos + n
+  if kind == _FLOAT:
+    n, pos = _read_varint(data, pos)
+    return float(data[pos:pos + n].decode("ascii")), pos + n
+  if kind == _DECIMAL:
+    n, pos = _read_varint(data, pos)
+    try:
+      return Decimal(data[pos:pos + n].decode("ascii")), pos + n
+    except InvalidOperation:
+      raise ValueError("invalid decimal value")
+
+  raise ValueError("invalid value kind " + str(kind))
+
+
+def encode(obj) -> bytes:
+  out = bytearray((_MAGIC, _VERSION))
+  _write(out, obj)
+  return bytes(out)
+
+
+def decode(data: bytes):
+  if len(data) < 2 or data[0] != _MAGIC:
+    raise ValueError("not an encoded adf object")
+  if data[1] != _VERSION:
+    raise ValueError("unsupported encoding version " + str(data[1]))
+
+  try:
+    obj, pos = _read(data, 2)
+  except IndexError:
+    raise ValueError("encoded adf object is truncated")
+
+  if pos != len(data):
+    raise ValueError("trailing data after encoded adf object")
+
+  return obj
+
+
+
+
+def _benchmark(count: int = 5000):
+  import time
+  from lxml import etree
+
+  prospects = []
+  for i in range(count):
+    contact = (Contact().add_name(Name("Jane").set_part("first")).add_name(Name("Doe").set_part("last"))
+      .add_email(Email("jane" + str(i) + "@example.com")).add_phone_number(PhoneNumber("555-0100").set_type("phone"))
+      .add_address(Address().add_street("1 Main St").set_city("Springfield").set_postalcode("12345")))
+    vehicle = (Vehicle(2020, "Toyota", "Camry").set_interest("buy").set_status("new").set_vin("VIN" + str(i))
+      .set_price(Price(25000).set_type("quote").set_currency("USD")))
+    prospects.append(Adf(Prospect().set_id(Id(str(i))).set_request_date(datetime(2024, 5, 1)).add_vehicle(vehicle)
+      .set_customer(Customer(contact)).set_vendor(Vendor("Dealer", Contact().add_name(Name("Sales"))))))
+
+  start = time.perf_counter()
+  xml = [etree.tostring(p.to_xml()) for p in prospects]
+  xml_encoded = time.perf_counter()
+  for x in xml:
+    Adf.from_xml_str(x)
+  xml_decoded = time.perf_counter()
+
+  binary = [encode(p) for p in prospects]
+  binary_encoded = time.perf_counter()
+  for b in binary:
+    decode(b)
+  binary_decoded = time.perf_counter()
+
+  print("xml:    encode %.1fus, decode %.1fus, %d bytes/lead"
+        % ((xml_encoded - start) / count * 1e6, (xml_decoded - xml_encoded) / count * 1e6, sum(map(len, xml)) // count))
+  print("binary: encode %.1fus, decode %.1fus, %d bytes/lead"
+        % ((binary_encoded - xml_decoded) / count * 1e6, (binary_decoded - binary_encoded) / count * 1e6, sum(map(len, binary)) // count))
+
+
+if __name__ == "__main__":
+  _benchmark()
@@ -0,0 +1,53 @@
+import unittest
+from decimal import Decimal
+
+from lxml import etree
+
+import adf
+import adf_binary
+from adf_test import make_prospect
+
+
+class BinaryTest (unittest.TestCase):
+    def test_round_trip(self):
+        prospect = make_prospect().set_status("resend")
+        prospect.get_vehicles()[0].add_color_combination("black", None, 1).set_imagetag("http://x", 10, None, None)
+        prospect.get_vehicles()[0].set_finance("lease", [{"amount": 300, "type": "monthly", "currency": "USD"}], {"balance": -5.5})
+
+        decoded = adf_binary.decode(adf_binary.encode(adf.Adf(prospect)))
+
+        self.assertIsInstance(decoded, adf.Adf)
+        self.assertEqual(decoded.get_prospect().get_vehicles()[0].get_price().value, Decimal(25000))
+        self.assertEqual(adf.diff(adf.Adf(prospect), decoded), {})
+
+    def test_same_xml(self):
+        xml = etree.tostring(make_prospect().to_xml())
+        decoded = adf_binary.decode(adf_binary.encode(make_prospect()))
+        self.assertEqual(etree.tostring(decoded.to_xml()), xml)
+
+    def test_smaller_than_xml(self):
+        prospect = make_prospect()
+        self.assertLess(len(adf_binary.encode(prospect)), len(etree.tostring(prospect.to_xml())))
+
+    def test_schema_covers_every_field(self):
+        prospect = make_prospect()
+        objects = [prospect, prospect.get_vehicles()[0], prospect.get_customer(), prospect.get_vendor(),
+                   prospect.get_provider(), prospect.get_customer().get_contact()]
+        for obj in objects:
+            self.assertEqual(set(adf._fields(obj)), set(adf_binary.SCHEMA[type(obj)]), type(obj).__name__)
+
+    def test_interned_strings(self):
+        self.assertEqual(len(set(adf_binary._INTERNED)), len(adf_binary._INTERNED))
+        for values in [adf._AMOUNT_TYPES, adf._AMOUNT_LIMITS, adf._BALANCE_TYPES, adf._FINANCE_METHODS]:
+            for value in values:
+                self.assertIn(value, adf_binary._INTERNED)
+
+    def test_invalid_input(self):
+        data = adf_binary.encode(make_prospect())
+        for bad in [b"", b"xx", data[:-3], data + b"\x00"]:
+            with self.assertRaises(ValueError):
+                adf_binary.decode(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
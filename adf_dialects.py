@@ -0,0 +1,130 @@
+from typing import Dict, Callable
+import threading
+from lxml import etree
+from adf import _xml_parser
+
+# the adf flavors particular crm targets expect. every dialect turns a serialized adf element (a whole <adf> from
+# Adf.to_xml() or a single <prospect>, e.g. in the partitioned writer) into the target's flavor.
+# stylesheets are compiled once per thread and reused, plain python functions can be registered for cheap edits
+
+
+
+
+_IDENTITY = b"""<xsl:template match="@*|node()">
+    <xsl:copy><xsl:apply-templates select="@*|node()"/></xsl:copy>
+  </xsl:template>"""
+
+
+# wraps the given templates in a stylesheet that copies everything else unchanged
+def identity_stylesheet(templates: str | bytes) -> bytes:
+  if type(templates) == str:
+    templates = templates.encode("utf-8")
+
+  return (b'<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">\n  '
+          + _IDENTITY + b"\n  " + templates + b"\n</xsl:stylesheet>")
+
+
+class XsltDialect:
+  def __init__(self, name: str, stylesheet: str | bytes):
+    self.name = name
+    self.__stylesheet = stylesheet.encode("utf-8") if type(stylesheet) == str else stylesheet
+    # compiled stylesheets aren't shared between threads, every thread compiles its own the first time it needs it
+    self.__local = threading.local()
+
+    # compiling right away makes a broken stylesheet fail when it's registered instead of on the first lead
+    self.__xslt()
+
+  def __xslt(self):
+    xslt = getattr(self.__local, "xslt", None)
+    if xslt is None:
+      # stylesheets don't get to read files or go to the network
+      xslt = etree.XSLT(etree.fromstring(self.__stylesheet, _xml_parser()), access_control=etree.XSLTAccessControl.DENY_ALL)
+      self.__local.xslt = xslt
+    return xslt
+
+  def apply(self, elem):
+    root = self.__xslt()(elem).getroot()
+    if root is None:
+      raise ValueError("dialect " + self.name + " produced an empty document")
+    return root
+
+
+class FunctionDialect:
+  # fn gets the element and returns the transformed one, it's free to change the element it was given in place
+  def __init__(self, name: str, fn: Callable):
+    self.name = name
+    self.fn = fn
+
+  def apply(self, elem):
+    return self.fn(elem)
+
+
+_dialects: Dict[str, XsltDialect | FunctionDialect] = {}
+_dialects_lock = threading.Lock()
+
+
+def register_dialect(dialect: XsltDialect | FunctionDialect):
+  with _dialects_lock:
+    _dialects[dialect.name] = dialect
+  return dialect
+
+
+def register_xslt(name: str, stylesheet: str | bytes):
+  return register_dialect(XsltDialect(name, stylesheet))
+
+
+def register_function(name: str, fn: Callable):
+  return register_dialect(FunctionDialect(name, fn))
+
+
+def get_dialect(name: str):
+  dialect = _dialects.get(name)
+  if dialect is None:
+    raise ValueError("unknown dialect " + name)
+  return dialect
+
+
+def transform(elem, name: str):
+  return get_dialect(name).apply(elem)
+
+
+# the odometer unit spelled out the way the adf spec's own example does it
+register_xslt("legacy-miles", identity_stylesheet(
+  """<xsl:template match="odometer/@units[. = 'mi']"><xsl:attribute name="units">miles</xsl:attribute></xsl:template>"""
+))
+
+register_xslt("no-street-line", identity_stylesheet(
+  """<xsl:template match="street/@line"/>"""
+))
+
+
+
+
+def _benchmark(count: int = 5000):
+  import time
+  from adf import Vehicle, Prospect, Adf, Customer, Contact, Name, Address
+
+  def lead(i):
+    contact = Contact().add_name(Name("x")).add_address(Address().add_street("1 Main St").add_street("Apt " + str(i)))
+    vehicle = Vehicle(2020, "Toyota", "Camry").set_odometer("90000").set_odometer_units("mi")
+    return Adf(Prospect().add_vehicle(vehicle).set_customer(Customer(contact))).to_xml()
+
+  def no_street_line(elem):
+    for street in elem.iter("street"):
+      street.attrib.pop("line", None)
+    return elem
+
+  register_function("no-street-line-python", no_street_line)
+
+  for name in ["legacy-miles", "no-street-line", "no-street-line-python"]:
+    elems = [lead(i) for i in range(count)]
+    dialect = get_dialect(name)
+    start = time.perf_counter()
+    for e in elems:
+      dialect.apply(e)
+    elapsed = time.perf_counter() - start
+    print("%-24s %.1fus per lead" % (name, elapsed / count * 1e6))
+
+
+if __name__ == "__main__":
+  _benchmark()
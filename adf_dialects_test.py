@@ -0,0 +1,70 @@
+import unittest
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
+import adf
+import adf_dialects
+from adf_writer import PartitionedWriter
+from adf_test import make_prospect
+
+
+def make_adf():
+    prospect = make_prospect()
+    prospect.get_vehicles()[0].set_odometer("90000").set_odometer_units("mi")
+    return adf.Adf(prospect)
+
+
+class DialectTest (unittest.TestCase):
+    def test_legacy_miles(self):
+        elem = make_adf().to_xml()
+        result = adf_dialects.transform(elem, "legacy-miles")
+        self.assertEqual(result.find("prospect/vehicle/odometer").get("units"), "miles")
+        # the input is left alone
+        self.assertEqual(elem.find("prospect/vehicle/odometer").get("units"), "mi")
+
+    def test_no_street_line(self):
+        result = adf_dialects.transform(make_adf().to_xml(), "no-street-line")
+        street = result.find("prospect/customer/contact/address/street")
+        self.assertEqual(street.text, "1 Main St")
+        self.assertIsNone(street.get("line"))
+
+    def test_threads(self):
+        elems = [make_adf().to_xml() for _ in range(20)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(adf_dialects.get_dialect("legacy-miles").apply, elems))
+        self.assertEqual({r.find("prospect/vehicle/odometer").get("units") for r in results}, {"miles"})
+
+    def test_registry(self):
+        def uppercase_make(elem):
+            for make in elem.iter("make"):
+                make.text = make.text.upper()
+            return elem
+
+        adf_dialects.register_function("test-upper", uppercase_make)
+        self.assertEqual(adf_dialects.transform(make_adf().to_xml(), "test-upper").findtext("prospect/vehicle/make"), "TOYOTA")
+
+        with self.assertRaises(ValueError):
+            adf_dialects.get_dialect("nope")
+        with self.assertRaises(etree.XSLTParseError):
+            adf_dialects.register_xslt("broken", adf_dialects.identity_stylesheet("<xsl:nonsense/>"))
+
+    def test_stylesheets_cant_read_files(self):
+        dialect = adf_dialects.XsltDialect("read", adf_dialects.identity_stylesheet(
+            """<xsl:template match="make"><make><xsl:value-of select="document('/etc/hostname')"/></make></xsl:template>"""))
+        with self.assertRaises(etree.XSLTApplyError):
+            dialect.apply(make_adf().to_xml())
+
+    def test_writer(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with PartitionedWriter(tmp, transform=adf_dialects.get_dialect("legacy-miles").apply) as writer:
+                writer.write(make_adf().get_prospect())
+
+            with open(os.path.join(tmp, "D-1.xml"), "rb") as f:
+                self.assertIn(b'units="miles"', f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+from typing import List, Iterator, Iterable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import email
+import email.policy
+import html
+import os
+import re
+import time
+from lxml import etree
+from adf import Prospect, iter_prospects
+
+# bulk ingestion of adf leads out of mail archives (mbox files or maildir directories).
+# messages are read one at a time, the adf payload is pulled out of the body or an attachment,
+# and the prospects in it are parsed, optionally across several processes
+
+
+
+
+class IngestStats:
+  def __init__(self):
+    self.messages = 0
+    self.prospects = 0
+    # messages without anything that looks like adf, and messages whose adf couldn't be parsed
+    self.no_adf = 0
+    self.failed = 0
+    # prospects that were skipped because they couldn't be read, the rest of their message is still ingested
+    self.invalid_prospects = 0
+    self.started = time.perf_counter()
+
+  def elapsed(self):
+    return time.perf_counter() - self.started
+
+  def messages_per_sec(self):
+    elapsed = self.elapsed()
+    return self.messages / elapsed if elapsed > 0 else 0
+
+  def __repr__(self):
+    return "IngestStats(messages=%d, prospects=%d, no_adf=%d, failed=%d, invalid_prospects=%d, %.0f messages/sec)" % (
+      self.messages, self.prospects, self.no_adf, self.failed, self.invalid_prospects, self.messages_per_sec())
+
+
+def _iter_mbox(path: str) -> Iterator[bytes]:
+  with open(path, "rb") as f:
+    lines: List[bytes] = []
+    for line in f:
+      # every message starts with a "From " line, body lines that start with it are escaped by the writer
+      if line.startswith(b"From "):
+        if lines:
+          yield b"".join(lines)
+        lines = []
+        continue
+      lines.append(line)
+
+    if lines:
+      yield b"".join(lines)
+
+
+def _iter_maildir(path: str) -> Iterator[bytes]:
+  for sub in ["new", "cur"]:
+    directory = os.path.join(path, sub)
+    if not os.path.isdir(directory):
+      continue
+    for name in sorted(os.listdir(directory)):
+      with open(os.path.join(directory, name), "rb") as f:
+        yield f.read()
+
+
+# the raw bytes of every message in an mbox file, or a maildir if path is a directory
+def iter_messages(path: str) -> Iterator[bytes]:
+  if os.path.isdir(path):
+    return _iter_maildir(path)
+  return _iter_mbox(path)
+
+
+# an <adf> element, not <adfoo> or anything else that happens to start with "adf"
+_ADF_START_BYTES = re.compile(rb"<adf[\s/>]")
+_ADF = re.compile(r"<adf(?:\s[^>]*)?(?:/>|>.*?</adf\s*>)", re.DOTALL)
+
+# every <adf> element in the text, a forwarded thread can quote several leads in one body.
+# the xml declaration is left out on purpose, the text has already been decoded and gets re-encoded as utf-8
+def _find_adf(text: str) -> List[str]:
+  return _ADF.findall(text)
+
+
+# every adf document in a message: xml parts, plain text bodies and html bodies with the adf escaped into them
+def extract_adf(message: bytes) -> List[bytes]:
+  msg = email.message_from_bytes(message, policy=email.policy.default)
+  payloads: List[bytes] = []
+
+  for part in msg.walk():
+    if part.is_multipart():
+      continue
+
+    content_type = part.get_content_type()
+    if content_type not in ["text/xml", "application/xml", "text/plain", "text/html", "application/octet-stream"]:
+      continue
+
+    try:
+      content = part.get_content()
+    except (LookupError, ValueError):
+      # unknown charset or broken transfer encoding, fall back to the raw bytes
+      content = part.get_payload(decode=True) or b""
+
+    if type(content) == bytes:
+      # xml attachments are handed over whole so the parser can go by their own xml declaration
+      if _ADF_START_BYTES.search(content):
+        payloads.append(content.strip())
+      continue
+
+    if content_type == "text/html" and "&lt;adf" in content:
+      content = html.unescape(content)
+
+    for adf in _find_adf(content):
+      payloads.append(adf.encode("utf-8"))
+
+  return payloads
+
+
+# (prospects, no adf, failed, invalid prospects) for a batch of raw messages
+def _process_batch(messages: List[bytes]):
+  prospects: List[Prospect] = []
+  no_adf = 0
+  failed = 0
+  invalid = 0
+
+  for message in messages:
+    try:
+      payloads = extract_adf(message)
+      if len(payloads) == 0:
+        no_adf += 1
+        continue
+
+      found: List[Prospect] = []
+      errors: List = []
+      for payload in payloads:
+        found.extend(iter_prospects([payload], errors))
+      prospects.extend(found)
+      invalid += len(errors)
+    except (ValueError, TypeError, etree.XMLSyntaxError):
+      failed += 1
+
+  return prospects, no_adf, failed, invalid
+
+
+def _batches(messages: Iterable[bytes], batch_size: int) -> Iterator[List[bytes]]:
+  batch: List[bytes] = []
+  for message in messages:
+    batch.append(message)
+    if len(batch) >= batch_size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
+
+
+# yields every prospect found in the mailbox, in message order. pass an IngestStats to follow progress and failures.
+# with processes > 1 batches of messages are parsed in a process pool, at most processes * 2 batches at a time
+def ingest(path: str, processes: int = 1, batch_size: int = 100, stats: IngestStats | None = None) -> Iterator[Prospect]:
+  stats = stats if stats is not None else IngestStats()
+  batches = _batches(iter_messages(path), batch_size)
+
+  def count(batch: List[bytes], result):
+    prospects, no_adf, failed, invalid = result
+    stats.messages += len(batch)
+    stats.prospects += len(prospects)
+    stats.no_adf += no_adf
+    stats.failed += failed
+    stats.invalid_prospects += invalid
+    return prospects
+
+  if processes <= 1:
+    for batch in batches:
+      yield from count(batch, _process_batch(batch))
+    return
+
+  with ProcessPoolExecutor(max_workers=processes) as executor:
+    pending = deque()
+
+    for batch in batches:
+      pending.append((batch, executor.submit(_process_batch, batch)))
+      if len(pending) >= processes * 2:
+        batch, future = pending.popleft()
+        yield from count(batch, future.result())
+
+    while pending:
+      batch, future = pending.popleft()
+      yield from count(batch, future.result())
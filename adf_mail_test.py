@@ -0,0 +1,95 @@
+import unittest
+import mailbox
+import os
+import tempfile
+from email.message import EmailMessage
+
+from lxml import etree
+
+import adf
+from adf_mail import IngestStats, extract_adf, ingest
+from adf_test import make_prospect
+
+
+def adf_bytes(vin, **kwargs):
+    return etree.tostring(adf.Adf(make_prospect(vin=vin)).to_xml(), **kwargs)
+
+
+def make_messages():
+    inline = EmailMessage()
+    inline["Subject"] = "lead"
+    inline.set_content("New lead below\n\n" + adf_bytes("inline").decode() + "\n\nthanks")
+
+    attached = EmailMessage()
+    attached["Subject"] = "lead"
+    attached.set_content("see attachment")
+    latin = adf_bytes("attached", xml_declaration=True, encoding="iso-8859-1").replace(b"Jane", "Jos\xe9".encode("iso-8859-1"))
+    attached.add_attachment(latin, maintype="application", subtype="xml", filename="lead.xml")
+
+    escaped = EmailMessage()
+    escaped.set_content("<p>" + adf_bytes("html").decode().replace("<", "&lt;").replace(">", "&gt;") + "</p>", subtype="html")
+
+    plain = EmailMessage()
+    plain.set_content("no lead in here\nFrom the sales team")
+
+    partial = EmailMessage()
+    partial.set_content(adf_bytes("partial").decode().replace("</adf>", "<prospect><customer/></prospect></adf>"))
+
+    broken = EmailMessage()
+    broken.set_content("<adf><prospect><vehicle></adf>")
+
+    return [inline, attached, escaped, plain, partial, broken]
+
+
+class MailIngestTest (unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_extract_attachment_charset(self):
+        payloads = extract_adf(make_messages()[1].as_bytes())
+        self.assertEqual(len(payloads), 1)
+        prospect = next(adf.iter_prospects(payloads))
+        self.assertEqual(prospect.get_customer().get_contact().names[0].value, "Jos\xe9")
+
+    def test_extract_every_document(self):
+        message = EmailMessage()
+        message.set_content("fwd:\n" + adf_bytes("first").decode() + "\n<adfoo>not a lead</adfoo>\n> " + adf_bytes("second").decode())
+        payloads = extract_adf(message.as_bytes())
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual([adf.Adf.from_xml_str(p).get_prospect().get_vehicles()[0].get_vin() for p in payloads], ["first", "second"])
+
+        message = EmailMessage()
+        message.set_content("<adfoo>not a lead</adfoo>")
+        self.assertEqual(extract_adf(message.as_bytes()), [])
+
+    def test_mbox(self):
+        path = os.path.join(self.tmp.name, "leads.mbox")
+        box = mailbox.mbox(path)
+        for message in make_messages():
+            box.add(message)
+        box.flush()
+
+        stats = IngestStats()
+        vins = [p.get_vehicles()[0].get_vin() for p in ingest(path, batch_size=2, stats=stats)]
+
+        self.assertEqual(vins, ["inline", "attached", "html", "partial"])
+        self.assertEqual((stats.messages, stats.prospects, stats.no_adf, stats.failed, stats.invalid_prospects), (6, 4, 1, 1, 1))
+
+    def test_maildir_with_processes(self):
+        path = os.path.join(self.tmp.name, "maildir")
+        box = mailbox.Maildir(path)
+        for message in make_messages() * 3:
+            box.add(message)
+
+        stats = IngestStats()
+        prospects = list(ingest(path, processes=2, batch_size=2, stats=stats))
+
+        self.assertEqual(len(prospects), 12)
+        self.assertEqual((stats.messages, stats.failed, stats.invalid_prospects), (18, 3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+from typing import Dict, List, Iterable, Callable
+import sys
+import tracemalloc
+from adf import _MODEL_TYPES
+
+# memory accounting for lead graphs. memory_report() walks the model objects and sums their deep sizes per class,
+# trace_memory() measures what a build/serialize call actually allocates
+
+
+
+
+class MemoryReport:
+  def __init__(self):
+    self.roots = 0
+    # class name -> number of objects / bytes owned by those objects
+    self.counts: Dict[str, int] = {}
+    self.sizes: Dict[str, int] = {}
+
+  def add(self, class_name: str, size: int):
+    self.counts[class_name] = self.counts.get(class_name, 0) + 1
+    self.sizes[class_name] = self.sizes.get(class_name, 0) + size
+
+  def total(self):
+    return sum(self.sizes.values())
+
+  def per_root(self):
+    return self.total() / self.roots if self.roots else 0
+
+  def format(self):
+    lines = ["%-12s %8s %12s" % ("class", "count", "bytes")]
+    for class_name in sorted(self.sizes, key=self.sizes.get, reverse=True):
+      lines.append("%-12s %8d %12d" % (class_name, self.counts[class_name], self.sizes[class_name]))
+    lines.append("%-12s %8d %12d" % ("total", self.roots, self.total()))
+    return "\n".join(lines)
+
+
+# size of a plain value (str, dict, list, ...) including everything it holds. model objects found along the way
+# are pushed on the stack so they're billed to their own class instead
+def _owned_size(value, seen: set, stack: List) -> int:
+  if isinstance(value, _MODEL_TYPES):
+    stack.append(value)
+    return 0
+
+  if id(value) in seen:
+    return 0
+  seen.add(id(value))
+
+  size = sys.getsizeof(value)
+
+  if isinstance(value, dict):
+    for k, v in value.items():
+      size += _owned_size(k, seen, stack) + _owned_size(v, seen, stack)
+  elif isinstance(value, (list, tuple, set, frozenset)):
+    for v in value:
+      size += _owned_size(v, seen, stack)
+
+  return size
+
+
+# sums the deep size of every object reachable from objs per class.
+# anything reachable more than once (a shared Contact, an interned string) is only counted the first time
+def memory_report(objs: Iterable) -> MemoryReport:
+  report = MemoryReport()
+  seen: set = set()
+  stack: List = []
+
+  for obj in objs:
+    report.roots += 1
+    stack.append(obj)
+
+  while stack:
+    obj = stack.pop()
+    if id(obj) in seen:
+      continue
+    seen.add(id(obj))
+
+    if hasattr(type(obj), "__slots__"):
+      # slotted records hold their values directly, there's no __dict__ to count
+      size = sys.getsizeof(obj) + sum(_owned_size(getattr(obj, k), seen, stack) for k in type(obj).__slots__)
+    else:
+      size = sys.getsizeof(obj) + _owned_size(vars(obj), seen, stack)
+    report.add(type(obj).__name__, size)
+
+  return report
+
+
+class TraceReport:
+  def __init__(self, result, allocated: int, peak: int, top: List[tracemalloc.StatisticDiff]):
+    self.result = result
+    # net bytes still allocated after the call, and the peak while it ran
+    self.allocated = allocated
+    self.peak = peak
+    self.top = top
+
+  def format(self):
+    lines = ["allocated %d bytes, peak %d bytes" % (self.allocated, self.peak)]
+    lines.extend(str(s) for s in self.top)
+    return "\n".join(lines)
+
+
+# runs fn(*args, **kwargs) between two tracemalloc snapshots and reports what it allocated, grouped by source line
+def trace_memory(fn: Callable, *args, limit: int = 10, **kwargs) -> TraceReport:
+  was_tracing = tracemalloc.is_tracing()
+  if not was_tracing:
+    tracemalloc.start()
+
+  try:
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    start, _ = tracemalloc.get_traced_memory()
+
+    result = fn(*args, **kwargs)
+
+    end, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+  finally:
+    if not was_tracing:
+      tracemalloc.stop()
+
+  filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+  top = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")[:limit]
+
+  return TraceReport(result, end - start, peak - start, top)
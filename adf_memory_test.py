@@ -0,0 +1,37 @@
+import unittest
+
+import adf
+from adf_memory import memory_report, trace_memory
+from adf_test import make_prospect
+
+
+class MemoryReportTest (unittest.TestCase):
+    def test_counts_per_class(self):
+        report = memory_report([make_prospect(), make_prospect()])
+        self.assertEqual(report.roots, 2)
+        self.assertEqual(report.counts["Prospect"], 2)
+        self.assertEqual(report.counts["Vehicle"], 2)
+        self.assertEqual(report.counts["Name"], 8)
+        self.assertGreater(report.sizes["Vehicle"], 0)
+        self.assertIn("Vehicle", report.format())
+
+    def test_shared_objects_counted_once(self):
+        contact = adf.Contact().add_name(adf.Name("Shared"))
+        shared = [make_prospect().set_customer(adf.Customer(contact)) for _ in range(2)]
+        report = memory_report(shared)
+        self.assertEqual(report.counts["Contact"], 3)
+        self.assertEqual(report.total(), sum(report.sizes.values()))
+
+        # the same prospect twice is the same memory
+        prospect = make_prospect()
+        self.assertEqual(memory_report([prospect, prospect]).total(), memory_report([prospect]).total())
+
+    def test_trace_memory(self):
+        trace = trace_memory(lambda: [make_prospect() for _ in range(100)])
+        self.assertEqual(len(trace.result), 100)
+        self.assertGreater(trace.allocated, 0)
+        self.assertGreaterEqual(trace.peak, trace.allocated)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,225 @@
+from typing import Dict, List
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+import math
+from adf import Prospect, _to_utc, normalize_email, normalize_phone
+
+# streaming lead metrics. leads are counted into fixed size time panes by provider, make, interest and status,
+# with a HyperLogLog sketch per pane for distinct customers. a pane is a tumbling window, and sliding windows are
+# answered by merging the panes they cover. only the most recent panes are kept, so memory stays bounded
+
+
+
+
+class HyperLogLog:
+  def __init__(self, p: int = 12):
+    if not 4 <= p <= 16:
+      raise ValueError("p must be between 4 and 16")
+
+    self.p = p
+    self.m = 1 << p
+    self.registers = bytearray(self.m)
+
+  def add(self, value: str):
+    h = int.from_bytes(blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+    index = h >> (64 - self.p)
+    rest = h & ((1 << (64 - self.p)) - 1)
+    # position of the first 1 bit in what's left of the hash
+    rank = (64 - self.p) - rest.bit_length() + 1
+
+    if rank > self.registers[index]:
+      self.registers[index] = rank
+
+  def merge(self, other: "HyperLogLog"):
+    if other.p != self.p:
+      raise ValueError("can't merge sketches of different precision")
+
+    self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+    return self
+
+  def copy(self):
+    sketch = HyperLogLog(self.p)
+    sketch.registers = bytearray(self.registers)
+    return sketch
+
+  def count(self) -> int:
+    alpha = 0.7213 / (1 + 1.079 / self.m)
+    estimate = alpha * self.m * self.m / sum(_INVERSE_POWERS[r] for r in self.registers)
+
+    # linear counting is much more accurate while most registers are still empty
+    zeros = self.registers.count(0)
+    if estimate <= 2.5 * self.m and zeros != 0:
+      estimate = self.m * math.log(self.m / zeros)
+
+    return round(estimate)
+
+
+_INVERSE_POWERS = [2.0 ** -r for r in range(66)]
+
+
+# the counted dimensions and how a prospect's vehicles map to them
+DIMENSIONS = ["provider", "make", "interest", "status"]
+
+
+def _provider(prospect: Prospect):
+  provider = prospect.get_provider()
+  if provider == None:
+    return "unknown"
+  if provider.id != None and provider.id.value:
+    return provider.id.value
+  if len(provider.names) != 0:
+    return provider.names[0].value
+  return "unknown"
+
+
+# emails identify a customer best, phones are the fallback
+def _customer_key(prospect: Prospect):
+  customer = prospect.get_customer()
+  if customer == None:
+    return None
+
+  contact = customer.get_contact()
+  for email in contact.emails:
+    if email.value:
+      return "e:" + normalize_email(email.value)
+  for phone in contact.phone_numbers:
+    if phone.value and normalize_phone(phone.value):
+      return "p:" + normalize_phone(phone.value)
+  return None
+
+
+class _Pane:
+  def __init__(self, start: datetime, p: int):
+    self.start = start
+    self.leads = 0
+    self.counts: Dict[str, Dict[str, int]] = {d: {} for d in DIMENSIONS}
+    self.customers = HyperLogLog(p)
+
+
+def _add_counts(into: Dict[str, Dict[str, int]], counts: Dict[str, Dict[str, int]]):
+  for dimension, values in counts.items():
+    target = into[dimension]
+    for value, n in values.items():
+      target[value] = target.get(value, 0) + n
+
+
+class LeadAggregator:
+  def __init__(self, pane: timedelta = timedelta(hours=1), panes_kept: int = 48, precision: int = 12):
+    if pane <= timedelta(0):
+      raise ValueError("pane must be positive")
+
+    self.pane = pane
+    self.panes_kept = panes_kept
+    self.precision = precision
+    self.__epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    self.__panes: Dict[datetime, _Pane] = {}
+    # leads that were older than every kept pane when they arrived
+    self.late = 0
+
+  # panes are aligned in utc, so leads with different (or no) offsets land in the same panes
+  def __pane_start(self, date: datetime):
+    return self.__epoch + ((_to_utc(date) - self.__epoch) // self.pane) * self.pane
+
+  def __pane(self, date: datetime):
+    start = self.__pane_start(date)
+    pane = self.__panes.get(start)
+    if pane is not None:
+      return pane
+
+    if len(self.__panes) >= self.panes_kept:
+      oldest = min(self.__panes)
+      if start < oldest:
+        return None
+      del self.__panes[oldest]
+
+    pane = _Pane(start, self.precision)
+    self.__panes[start] = pane
+    return pane
+
+  # counts the lead into the pane of its requestdate, or of the current time if it doesn't have one
+  def add(self, prospect: Prospect):
+    pane = self.__pane(prospect.get_request_date() or datetime.now(timezone.utc))
+    if pane is None:
+      self.late += 1
+      return
+
+    pane.leads += 1
+    counts = pane.counts
+
+    provider = _provider(prospect)
+    counts["provider"][provider] = counts["provider"].get(provider, 0) + 1
+
+    for vehicle in prospect.get_vehicles():
+      make = (vehicle.get_make() or "unknown").strip().lower()
+      interest = vehicle.get_interest() or "unknown"
+      status = vehicle.get_status() or "unknown"
+      counts["make"][make] = counts["make"].get(make, 0) + 1
+      counts["interest"][interest] = counts["interest"].get(interest, 0) + 1
+      counts["status"][status] = counts["status"].get(status, 0) + 1
+
+    customer = _customer_key(prospect)
+    if customer != None:
+      pane.customers.add(customer)
+
+  # one entry per kept pane, oldest first
+  def tumbling(self) -> List[Dict]:
+    return [{
+      "start": pane.start.isoformat(),
+      "end": (pane.start + self.pane).isoformat(),
+      "leads": pane.leads,
+      "counts": {d: dict(v) for d, v in pane.counts.items()},
+      "distinct_customers": pane.customers.count(),
+    } for pane in sorted(self.__panes.values(), key=lambda p: p.start)]
+
+  # totals over the panes that start in [end - window, end). end defaults to the end of the newest pane,
+  # naive dates are taken to be utc
+  def sliding(self, window: timedelta, end: datetime | None = None) -> Dict:
+    if end is None:
+      end = max(self.__panes) + self.pane if self.__panes else datetime.now(timezone.utc)
+    end = _to_utc(end)
+    start = end - window
+
+    leads = 0
+    counts: Dict[str, Dict[str, int]] = {d: {} for d in DIMENSIONS}
+    customers = HyperLogLog(self.precision)
+    for pane in self.__panes.values():
+      if start <= pane.start < end:
+        leads += pane.leads
+        _add_counts(counts, pane.counts)
+        customers.merge(pane.customers)
+
+    return {
+      "start": start.isoformat(),
+      "end": end.isoformat(),
+      "leads": leads,
+      "counts": counts,
+      "distinct_customers": customers.count(),
+    }
+
+
+
+
+def _benchmark(count: int = 200000):
+  import time
+  from adf import Vehicle, Customer, Contact, Name, Email, Provider, Id
+
+  makes = ["Toyota", "Honda", "Ford", "Chevrolet", "Nissan"]
+  prospects = [Prospect()
+    .set_request_date(datetime(2024, 5, 1) + timedelta(seconds=i))
+    .add_vehicle(Vehicle(2020, makes[i % 5], "Model").set_interest("buy").set_status("new"))
+    .set_customer(Customer(Contact().add_name(Name("x")).add_email(Email("c" + str(i % 50000) + "@example.com"))))
+    .set_provider(Provider().set_id(Id("P-" + str(i % 20))))
+    for i in range(count)]
+
+  aggregator = LeadAggregator()
+  start = time.perf_counter()
+  for p in prospects:
+    aggregator.add(p)
+  elapsed = time.perf_counter() - start
+
+  print("%d leads in %.2fs (%.0f leads/sec)" % (count, elapsed, count / elapsed))
+  print("distinct customers: %d (actual %d)" % (aggregator.sliding(timedelta(days=7))["distinct_customers"], min(count, 50000)))
+
+
+if __name__ == "__main__":
+  _benchmark()
@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import adf
+from adf_metrics import HyperLogLog, LeadAggregator
+from adf_test import make_prospect
+
+
+def make_lead(hour, email="jane@example.com", make="Toyota"):
+    return make_prospect(email=email, make=make).set_request_date(datetime(2024, 5, 1, hour, 30))
+
+
+class HyperLogLogTest (unittest.TestCase):
+    def test_estimate(self):
+        sketch = HyperLogLog()
+        for i in range(20000):
+            sketch.add(str(i))
+            sketch.add(str(i))
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.05)
+        self.assertEqual(HyperLogLog().count(), 0)
+
+    def test_merge(self):
+        a = HyperLogLog()
+        b = HyperLogLog()
+        for i in range(1000):
+            a.add("a" + str(i))
+            b.add("b" + str(i))
+        self.assertAlmostEqual(a.copy().merge(b).count(), 2000, delta=100)
+        with self.assertRaises(ValueError):
+            a.merge(HyperLogLog(10))
+
+
+class LeadAggregatorTest (unittest.TestCase):
+    def test_tumbling(self):
+        aggregator = LeadAggregator()
+        aggregator.add(make_lead(1))
+        aggregator.add(make_lead(1, email="JANE@example.com ", make="Honda"))
+        aggregator.add(make_lead(2, email="bob@example.com"))
+
+        panes = aggregator.tumbling()
+        self.assertEqual([p["start"] for p in panes], ["2024-05-01T01:00:00+00:00", "2024-05-01T02:00:00+00:00"])
+        self.assertEqual(panes[0]["leads"], 2)
+        self.assertEqual(panes[0]["counts"]["make"], {"toyota": 1, "honda": 1})
+        self.assertEqual(panes[0]["counts"]["provider"], {"P-1": 2})
+        self.assertEqual(panes[0]["distinct_customers"], 1)
+
+    def test_sliding(self):
+        aggregator = LeadAggregator()
+        for hour in range(6):
+            aggregator.add(make_lead(hour, email=str(hour) + "@example.com"))
+
+        window = aggregator.sliding(timedelta(hours=3))
+        self.assertEqual(window["leads"], 3)
+        self.assertEqual(window["distinct_customers"], 3)
+        self.assertEqual(aggregator.sliding(timedelta(hours=2), end=datetime(2024, 5, 1, 2))["leads"], 2)
+
+    def test_mixed_timezones(self):
+        aggregator = LeadAggregator()
+        aggregator.add(make_lead(1))
+        # 2024-04-30 18:30 at -07:00 and 07:00 at +05:30 are both 01:30 utc
+        aggregator.add(make_lead(1).set_request_date(datetime(2024, 4, 30, 18, 30, tzinfo=timezone(timedelta(hours=-7)))))
+        aggregator.add(make_lead(1).set_request_date(datetime(2024, 5, 1, 7, tzinfo=timezone(timedelta(hours=5, minutes=30)))))
+        # no requestdate, counted at the current time
+        aggregator.add(adf.Prospect())
+
+        panes = aggregator.tumbling()
+        self.assertEqual((panes[0]["start"], panes[0]["leads"]), ("2024-05-01T01:00:00+00:00", 3))
+        self.assertEqual(aggregator.sliding(timedelta(hours=1), end=datetime(2024, 5, 1, 2))["leads"], 3)
+
+    def test_bounded_panes(self):
+        aggregator = LeadAggregator(panes_kept=2)
+        for hour in [1, 2, 3]:
+            aggregator.add(make_lead(hour))
+        aggregator.add(make_lead(0))
+
+        self.assertEqual([p["leads"] for p in aggregator.tumbling()], [1, 1])
+        self.assertEqual(aggregator.late, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+from typing import List, Tuple, Callable, Iterator, Iterable
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import os
+import sys
+import threading
+from lxml import etree
+from adf import Adf, Prospect, _xml_parser
+
+# parses large adf archives on several cores. the archive is split into byte ranges that each start at a <prospect>
+# tag, every range is parsed in a worker process, and the prospects are streamed back in order or as they finish.
+#
+# NOTE: ranges are found by looking for the literal "<prospect" tag, so archives can't contain it inside comments or
+# CDATA. prospects are re-wrapped in a bare <adf>, which means the archive has to be utf-8 and can't rely on
+# namespaces or entities declared on the root element
+
+
+
+
+_OPEN_TAG = b"<prospect"
+_CLOSE_TAG = b"</prospect>"
+# what can follow "<prospect" for it to be the tag itself and not e.g. "<prospects"
+_TAG_END = b">/ \t\r\n"
+
+_SCAN_SIZE = 1024 * 1024
+
+
+def _find_open_tag(data: bytes, start: int = 0):
+  while True:
+    i = data.find(_OPEN_TAG, start)
+    if i == -1 or i + len(_OPEN_TAG) >= len(data):
+      return i
+    if data[i + len(_OPEN_TAG)] in _TAG_END:
+      return i
+    start = i + 1
+
+
+def _next_prospect(f, offset: int):
+  # offset of the first <prospect> tag at or after offset, or None
+  f.seek(offset)
+  carry = b""
+  while True:
+    block = f.read(_SCAN_SIZE)
+    data = carry + block
+
+    i = _find_open_tag(data)
+    # a tag right at the end of what was read might still turn out to be "<prospects", read more first
+    if i != -1 and (i + len(_OPEN_TAG) < len(data) or not block):
+      return offset - len(carry) + i
+
+    if not block:
+      return None
+
+    # keep enough of the end around to find a tag that's split across two blocks
+    carry = data[-len(_OPEN_TAG):]
+    offset += len(block)
+
+
+# splits the archive into [start, end) byte ranges of roughly chunk_size that each begin at a <prospect> tag
+def find_ranges(path: str, chunk_size: int = 64 * 1024 * 1024) -> List[Tuple[int, int]]:
+  size = os.path.getsize(path)
+  starts: List[int] = []
+
+  with open(path, "rb") as f:
+    offset = 0
+    while offset < size:
+      start = _next_prospect(f, offset)
+      if start is None:
+        break
+      starts.append(start)
+      offset = start + max(chunk_size, 1)
+
+  return list(zip(starts, starts[1:] + [size]))
+
+
+def _parse_range(path: str, start: int, end: int, transform: Callable | None):
+  with open(path, "rb") as f:
+    f.seek(start)
+    data = f.read(end - start)
+
+  # only the <prospect>...</prospect> slices are kept, whatever sits between them (</adf>, the next document's
+  # header, whitespace) is dropped
+  parts = [b"<adf>"]
+  pos = 0
+  while True:
+    i = _find_open_tag(data, pos)
+    if i == -1:
+      break
+    j = data.find(_CLOSE_TAG, i)
+    if j == -1:
+      raise ValueError("unterminated prospect at byte " + str(start + i))
+    pos = j + len(_CLOSE_TAG)
+    parts.append(data[i:pos])
+  parts.append(b"</adf>")
+
+  root = etree.fromstring(b"".join(parts), _xml_parser())
+  prospects = [Prospect.from_xml(p) for p in root]
+
+  if transform is not None:
+    return [transform(p) for p in prospects]
+  return prospects
+
+
+# yields every prospect in the archive, or transform(prospect) if given.
+# transform runs in the worker processes, so it has to be picklable (a module level function), and is the place to
+# turn prospects into something cheaper to send back, like a dict.
+# at most processes * 2 ranges are in flight at a time, so a slow consumer doesn't make results pile up
+def parse_archive(path: str,
+                  processes: int | None = None,
+                  chunk_size: int = 64 * 1024 * 1024,
+                  ordered: bool = True,
+                  transform: Callable | None = None,
+) -> Iterator:
+  ranges = deque(find_ranges(path, chunk_size))
+  processes = processes or os.cpu_count() or 1
+
+  with ProcessPoolExecutor(max_workers=processes) as executor:
+    pending = deque()
+
+    def submit():
+      while ranges and len(pending) < processes * 2:
+        start, end = ranges.popleft()
+        pending.append(executor.submit(_parse_range, path, start, end, transform))
+
+    submit()
+    while pending:
+      if ordered:
+        done = pending.popleft()
+      else:
+        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+        done = finished.pop()
+        pending.remove(done)
+
+      results = done.result()
+      submit()
+      yield from results
+
+
+
+# thread mode: lxml releases the GIL while it parses and serializes, so those stages run in a thread pool while
+# turning elements into model objects (and back), which holds the GIL, stays batched in the calling thread.
+# on free-threaded builds nothing holds the GIL, and the whole pipeline runs in the pool
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def shared_executor() -> ThreadPoolExecutor:
+  global _executor
+  with _executor_lock:
+    if _executor is None:
+      _executor = ThreadPoolExecutor(thread_name_prefix="adf")
+    return _executor
+
+
+def _gil_enabled():
+  return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+# the workers hand lxml elements back and forth, which can't be pickled, so these need threads.
+# parse_archive() is the one that uses processes
+def _thread_executor(executor: ThreadPoolExecutor | None) -> ThreadPoolExecutor:
+  if executor is None:
+    return shared_executor()
+  if isinstance(executor, ProcessPoolExecutor):
+    raise ValueError("parse_many() and tostring_many() need a thread pool, not a process pool")
+  return executor
+
+
+def _batches(items: List, batch_size: int):
+  return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def _parse_batch(documents: List[bytes | str]):
+  # the parser isn't thread safe, so every batch gets its own
+  parser = _xml_parser()
+  return [etree.fromstring(d.encode("utf-8") if type(d) == str else d, parser) for d in documents]
+
+
+def _build_batch(documents: List[bytes | str]):
+  return [Adf.from_xml(root) for root in _parse_batch(documents)]
+
+
+def _to_xml_batch(objs: List):
+  return [obj.to_xml() for obj in objs]
+
+
+def _tostring_batch(elems: List):
+  return [etree.tostring(e, encoding="utf-8") for e in elems]
+
+
+def _tostring_objects_batch(objs: List):
+  return _tostring_batch(_to_xml_batch(objs))
+
+
+# parses every adf document, same as calling Adf.from_xml_str() on each of them, results are in input order
+def parse_many(documents: Iterable[bytes | str], executor: ThreadPoolExecutor | None = None,
+               batch_size: int = 32) -> List[Adf]:
+  executor = _thread_executor(executor)
+  batches = _batches(list(documents), batch_size)
+
+  if not _gil_enabled():
+    futures = [executor.submit(_build_batch, b) for b in batches]
+    return [adf for f in futures for adf in f.result()]
+
+  futures = [executor.submit(_parse_batch, b) for b in batches]
+  return [Adf.from_xml(root) for f in futures for root in f.result()]
+
+
+# serializes every model object, same as etree.tostring(obj.to_xml(), encoding="utf-8"), results are in input order
+def tostring_many(objs: Iterable, executor: ThreadPoolExecutor | None = None, batch_size: int = 32) -> List[bytes]:
+  executor = _thread_executor(executor)
+  batches = _batches(list(objs), batch_size)
+
+  if not _gil_enabled():
+    futures = [executor.submit(_tostring_objects_batch, b) for b in batches]
+    return [data for f in futures for data in f.result()]
+
+  # building a batch's elements overlaps with the pool serializing the batches before it
+  futures = [executor.submit(_tostring_batch, _to_xml_batch(b)) for b in batches]
+  return [data for f in futures for data in f.result()]
+
+
+
+
+def _write_archive(path: str, count: int):
+  from datetime import datetime
+  from adf import Vehicle, Customer, Contact, Name, Email, Address, Vendor, Id, Price
+
+  with open(path, "wb") as f:
+    f.write(b"<adf>\n")
+    for i in range(count):
+      contact = (Contact().add_name(Name("Jane").set_part("first")).add_email(Email("jane" + str(i) + "@example.com"))
+        .add_address(Address().add_street("1 Main St").set_city("Springfield").set_postalcode("12345")))
+      prospect = (Prospect().set_id(Id(str(i))).set_request_date(datetime(2024, 5, 1))
+        .add_vehicle(Vehicle(2020, "Toyota", "Camry").set_vin("VIN" + str(i)).set_price(Price(25000).set_currency("USD")))
+        .set_customer(Customer(contact)).set_vendor(Vendor("Dealer", Contact().add_name(Name("Sales")))))
+      f.write(etree.tostring(prospect.to_xml()) + b"\n")
+    f.write(b"</adf>\n")
+
+
+def _benchmark(count: int = 50000):
+  import tempfile
+  import time
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "archive.xml")
+    _write_archive(path, count)
+    size = os.path.getsize(path)
+
+    for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+      start = time.perf_counter()
+      n = sum(1 for _ in parse_archive(path, processes=processes, chunk_size=size // (processes * 4) + 1))
+      elapsed = time.perf_counter() - start
+      print("%2d processes: %d prospects in %.2fs (%.1f MB/s)" % (processes, n, elapsed, size / elapsed / 1e6))
+
+
+def _benchmark_threads(count: int = 20000):
+  import tempfile
+  import time
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, "archive.xml")
+    _write_archive(path, count)
+    prospects = list(parse_archive(path, processes=1))
+
+  adfs = [Adf(p) for p in prospects]
+  documents = [etree.tostring(a.to_xml(), encoding="utf-8") for a in adfs]
+  print("python %s, gil %s" % (sys.version.split()[0], "enabled" if _gil_enabled() else "disabled"))
+
+  def measure(name, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print("%-28s %.2fs (%.0f docs/sec)" % (name, elapsed, count / elapsed))
+
+  measure("parse, single thread", lambda: [Adf.from_xml_str(d) for d in documents])
+  measure("parse, thread pool", lambda: parse_many(documents))
+  with ProcessPoolExecutor() as executor:
+    measure("parse, process pool", lambda: [a for b in executor.map(_build_batch, _batches(documents, 256)) for a in b])
+
+  measure("tostring, single thread", lambda: [etree.tostring(a.to_xml(), encoding="utf-8") for a in adfs])
+  measure("tostring, thread pool", lambda: tostring_many(adfs))
+  with ProcessPoolExecutor() as executor:
+    measure("tostring, process pool", lambda: [d for b in executor.map(_tostring_objects_batch, _batches(adfs, 256)) for d in b])
+
+
+if __name__ == "__main__":
+  _benchmark()
+  _benchmark_threads()
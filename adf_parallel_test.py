@@ -0,0 +1,92 @@
+import unittest
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from lxml import etree
+
+import adf
+import adf_parallel
+from adf_parallel import find_ranges, parse_archive, parse_many, tostring_many
+from adf_test import make_prospect
+
+
+def vin(prospect):
+    return prospect.get_vehicles()[0].get_vin()
+
+
+class ParallelParseTest (unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "archive.xml")
+
+        # two concatenated documents, plus a <prospects> tag that must not be taken for a prospect
+        with open(self.path, "wb") as f:
+            f.write(b'<?xml version="1.0"?>\n<adf>\n<prospects/>')
+            for i in range(10):
+                f.write(etree.tostring(make_prospect(vin=str(i)).to_xml()))
+            f.write(b"</adf>\n<adf>")
+            for i in range(10, 20):
+                f.write(etree.tostring(make_prospect(vin=str(i)).to_xml()) + b"\n")
+            f.write(b"</adf>\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ranges_start_at_prospects(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        ranges = find_ranges(self.path, chunk_size=3000)
+        self.assertGreater(len(ranges), 1)
+        self.assertEqual(ranges[-1][1], len(data))
+        for start, end in ranges:
+            self.assertTrue(data[start:].startswith(b"<prospect>"))
+
+    def test_small_scan_blocks(self):
+        expected = find_ranges(self.path, chunk_size=1)
+        self.assertEqual(len(expected), 20)
+
+        old = adf_parallel._SCAN_SIZE
+        adf_parallel._SCAN_SIZE = 7
+        try:
+            self.assertEqual(find_ranges(self.path, chunk_size=1), expected)
+        finally:
+            adf_parallel._SCAN_SIZE = old
+
+    def test_ordered(self):
+        prospects = list(parse_archive(self.path, processes=2, chunk_size=2000))
+        self.assertEqual([vin(p) for p in prospects], [str(i) for i in range(20)])
+
+    def test_unordered_with_transform(self):
+        vins = list(parse_archive(self.path, processes=2, chunk_size=2000, ordered=False, transform=vin))
+        self.assertEqual(sorted(vins, key=int), [str(i) for i in range(20)])
+
+
+class ThreadPoolTest (unittest.TestCase):
+    def test_parse_many(self):
+        documents = [etree.tostring(adf.Adf(make_prospect(vin=str(i))).to_xml()) for i in range(50)]
+        documents[3] = documents[3].decode()
+        parsed = parse_many(documents, batch_size=4)
+        self.assertEqual([vin(a.get_prospect()) for a in parsed], [str(i) for i in range(50)])
+
+    def test_tostring_many(self):
+        prospects = [make_prospect(vin=str(i)) for i in range(50)]
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            self.assertEqual(tostring_many(prospects, executor=executor, batch_size=7),
+                             [etree.tostring(p.to_xml(), encoding="utf-8") for p in prospects])
+
+    def test_parse_many_invalid(self):
+        with self.assertRaises(etree.XMLSyntaxError):
+            parse_many([b"<adf>"])
+
+    def test_process_pool_rejected(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            with self.assertRaises(ValueError):
+                parse_many([b"<adf/>"], executor=executor)
+            with self.assertRaises(ValueError):
+                tostring_many([make_prospect()], executor=executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
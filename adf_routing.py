@@ -0,0 +1,242 @@
+from typing import Dict, List, Iterable, Tuple
+from bisect import bisect_left
+from adf import Prospect
+
+# routes prospects to dealers by compiling a rule set into per-field indexes.
+# every rule gets one bit, so matching a lead is a handful of dict lookups and integer ANDs
+# instead of evaluating each rule against it
+
+
+
+
+class Rule:
+  def __init__(self, dealer: str, priority: int = 0):
+    self.dealer = dealer
+    self.priority = priority
+    # None means the rule doesn't care about that field
+    self.makes: set | None = None
+    self.models: set | None = None
+    self.statuses: set | None = None
+    self.interests: set | None = None
+    self.provider_ids: set | None = None
+    self.postal_ranges: List[Tuple[str, str]] | None = None
+
+  def set_makes(self, *makes: str):
+    self.makes = {_normalize(m) for m in makes}
+    return self
+
+  def set_models(self, *models: str):
+    self.models = {_normalize(m) for m in models}
+    return self
+
+  def set_statuses(self, *statuses: str):
+    self.statuses = set(statuses)
+    return self
+
+  def set_interests(self, *interests: str):
+    self.interests = set(interests)
+    return self
+
+  def set_provider_ids(self, *provider_ids: str):
+    self.provider_ids = set(provider_ids)
+    return self
+
+  # NOTE: postal codes are compared as strings, so ranges only make sense between codes of the same format
+  def add_postal_range(self, low: str, high: str):
+    low = _normalize_postalcode(low)
+    high = _normalize_postalcode(high)
+
+    if low > high:
+      raise ValueError("postal range must have low <= high")
+
+    if self.postal_ranges is None:
+      self.postal_ranges = []
+    self.postal_ranges.append((low, high))
+    return self
+
+
+def _normalize(value: str | None):
+  return value.strip().lower() if value else None
+
+
+def _normalize_postalcode(value: str | None):
+  return value.strip().upper() if value else None
+
+
+# the fields a rule can match on, and the attribute on Rule that holds its allowed values
+_HASH_FIELDS = ["makes", "models", "statuses", "interests", "provider_ids"]
+
+
+class _PostalIndex:
+  # elementary-interval index: for every distinct range endpoint it stores the mask of rules that cover
+  # the endpoint itself and the mask of rules that cover the gap up to the next endpoint
+  def __init__(self, rules: List[Rule]):
+    # endpoint -> {rule bit: number of that rule's ranges starting/ending there}
+    starts: Dict[str, Dict[int, int]] = {}
+    ends: Dict[str, Dict[int, int]] = {}
+    for bit, rule in enumerate(rules):
+      for low, high in rule.postal_ranges or []:
+        starts.setdefault(low, {})[bit] = starts.get(low, {}).get(bit, 0) + 1
+        ends.setdefault(high, {})[bit] = ends.get(high, {}).get(bit, 0) + 1
+
+    self.endpoints = sorted(starts.keys() | ends.keys())
+    self.at: List[int] = []
+    self.after: List[int] = []
+
+    # rules with several overlapping ranges are counted per range so one ending doesn't drop the others
+    open_counts: Dict[int, int] = {}
+    active = 0
+    for point in self.endpoints:
+      for bit, n in starts.get(point, {}).items():
+        open_counts[bit] = open_counts.get(bit, 0) + n
+        active |= 1 << bit
+      self.at.append(active)
+
+      for bit, n in ends.get(point, {}).items():
+        open_counts[bit] -= n
+        if open_counts[bit] == 0:
+          active &= ~(1 << bit)
+      self.after.append(active)
+
+  def lookup(self, postalcode: str):
+    i = bisect_left(self.endpoints, postalcode)
+    if i < len(self.endpoints) and self.endpoints[i] == postalcode:
+      return self.at[i]
+    if i == 0:
+      return 0
+    return self.after[i - 1]
+
+
+def _bits(mask: int):
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask ^= low
+
+
+class Router:
+  def __init__(self, rules: Iterable[Rule]):
+    # higher priority rules get lower bits, so the best match is always the lowest set bit.
+    # sorted() is stable, which keeps the given order between rules of the same priority
+    self.__rules = sorted(rules, key=lambda r: -r.priority)
+    self.__all = (1 << len(self.__rules)) - 1
+
+    self.__wildcards: Dict[str, int] = {}
+    self.__indexes: Dict[str, Dict[str, int]] = {}
+    for field in _HASH_FIELDS:
+      wildcard = 0
+      index: Dict[str, int] = {}
+      for bit, rule in enumerate(self.__rules):
+        values = getattr(rule, field)
+        if values is None:
+          wildcard |= 1 << bit
+          continue
+        for v in values:
+          index[v] = index.get(v, 0) | (1 << bit)
+      self.__wildcards[field] = wildcard
+      self.__indexes[field] = index
+
+    self.__postal_wildcard = 0
+    for bit, rule in enumerate(self.__rules):
+      if rule.postal_ranges is None:
+        self.__postal_wildcard |= 1 << bit
+    self.__postal_index = _PostalIndex(self.__rules)
+
+  def __field_mask(self, field: str, value: str | None):
+    if value is None:
+      return self.__wildcards[field]
+    return self.__wildcards[field] | self.__indexes[field].get(value, 0)
+
+  def __match(self, prospect: Prospect):
+    # lead level fields first, they apply to every vehicle on the lead
+    mask = self.__all
+
+    provider = prospect.get_provider()
+    provider_id = provider.id.value if provider != None and provider.id != None else None
+    mask &= self.__field_mask("provider_ids", provider_id)
+
+    postal_mask = self.__postal_wildcard
+    customer = prospect.get_customer()
+    if customer != None:
+      for address in customer.get_contact().addresses:
+        if address.postalcode:
+          postal_mask |= self.__postal_index.lookup(_normalize_postalcode(address.postalcode))
+    mask &= postal_mask
+
+    if not mask:
+      return 0
+
+    # a lead matches a rule if any of its vehicles does
+    vehicles = prospect.get_vehicles()
+    if len(vehicles) == 0:
+      return (mask & self.__wildcards["makes"] & self.__wildcards["models"]
+              & self.__wildcards["statuses"] & self.__wildcards["interests"])
+
+    matched = 0
+    for vehicle in vehicles:
+      m = mask
+      m &= self.__field_mask("makes", _normalize(vehicle.get_make()))
+      m &= self.__field_mask("models", _normalize(vehicle.get_model()))
+      m &= self.__field_mask("statuses", vehicle.get_status())
+      m &= self.__field_mask("interests", vehicle.get_interest())
+      matched |= m
+
+    return matched
+
+  # the highest priority rule that matches the prospect, or None
+  def route(self, prospect: Prospect) -> Rule | None:
+    mask = self.__match(prospect)
+    if not mask:
+      return None
+    return self.__rules[(mask & -mask).bit_length() - 1]
+
+  # every matching rule, best first
+  def route_all(self, prospect: Prospect) -> List[Rule]:
+    return [self.__rules[bit] for bit in _bits(self.__match(prospect))]
+
+  def route_many(self, prospects: Iterable[Prospect]) -> List[Rule | None]:
+    return [self.route(p) for p in prospects]
+
+
+
+
+def _benchmark(rule_count: int = 5000, lead_count: int = 20000):
+  import random
+  import time
+  from adf import Vehicle, Customer, Contact, Name, Address, Provider, Id
+
+  rng = random.Random(0)
+  makes = ["Toyota", "Honda", "Ford", "Chevrolet", "Nissan", "BMW", "Kia", "Hyundai", "Subaru", "Mazda"]
+
+  rules = []
+  for i in range(rule_count):
+    rule = Rule("dealer-" + str(i), priority=rng.randint(0, 3)).set_makes(rng.choice(makes))
+    if rng.random() < 0.5:
+      rule.set_statuses(rng.choice(["new", "used"]))
+    if rng.random() < 0.2:
+      rule.set_provider_ids("P-" + str(rng.randint(0, 20)))
+    low = rng.randint(10000, 99000)
+    rule.add_postal_range(str(low), str(low + rng.randint(0, 900)))
+    rules.append(rule)
+
+  leads = []
+  for i in range(lead_count):
+    contact = Contact().add_name(Name("x")).add_address(Address().set_postalcode(str(rng.randint(10000, 99999))))
+    leads.append(Prospect()
+      .add_vehicle(Vehicle(2020, rng.choice(makes), "Model").set_status(rng.choice(["new", "used"])))
+      .set_customer(Customer(contact))
+      .set_provider(Provider().set_id(Id("P-" + str(rng.randint(0, 20))))))
+
+  start = time.perf_counter()
+  router = Router(rules)
+  compiled = time.perf_counter()
+  routed = router.route_many(leads)
+  done = time.perf_counter()
+
+  print("compiled %d rules in %.3fs" % (rule_count, compiled - start))
+  print("routed %d leads in %.3fs (%.0f leads/sec, %d matched)"
+        % (lead_count, done - compiled, lead_count / (done - compiled), sum(r != None for r in routed)))
+
+
+if __name__ == "__main__":
+  _benchmark()
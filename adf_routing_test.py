@@ -0,0 +1,60 @@
+import unittest
+
+import adf
+from adf_routing import Rule, Router
+
+
+def make_lead(make="Toyota", status="new", postalcode="12345", provider_id="P-1"):
+    contact = adf.Contact().add_name(adf.Name("x")).add_address(adf.Address().set_postalcode(postalcode))
+    return (adf.Prospect()
+        .add_vehicle(adf.Vehicle(2020, make, "Camry").set_status(status))
+        .set_customer(adf.Customer(contact))
+        .set_provider(adf.Provider().set_id(adf.Id(provider_id))))
+
+
+class RouterTest (unittest.TestCase):
+    def test_make_and_status(self):
+        router = Router([
+            Rule("used-toyota").set_makes("toyota").set_statuses("used"),
+            Rule("any-toyota").set_makes("Toyota"),
+        ])
+        self.assertEqual(router.route(make_lead()).dealer, "any-toyota")
+        self.assertEqual(router.route(make_lead(status="used")).dealer, "used-toyota")
+        self.assertIsNone(router.route(make_lead(make="Honda")))
+
+    def test_priority(self):
+        router = Router([Rule("low"), Rule("high", priority=5)])
+        self.assertEqual([r.dealer for r in router.route_all(make_lead())], ["high", "low"])
+
+    def test_postal_ranges(self):
+        router = Router([
+            Rule("a").add_postal_range("10000", "12345"),
+            Rule("b").add_postal_range("12000", "13000").add_postal_range("20000", "20000"),
+        ])
+        self.assertEqual([r.dealer for r in router.route_all(make_lead(postalcode="12345"))], ["a", "b"])
+        self.assertEqual([r.dealer for r in router.route_all(make_lead(postalcode="12346"))], ["b"])
+        self.assertEqual([r.dealer for r in router.route_all(make_lead(postalcode="20000"))], ["b"])
+        self.assertEqual(router.route_all(make_lead(postalcode="09999")), [])
+        self.assertEqual(router.route_all(make_lead(postalcode="15000")), [])
+
+        # several ranges of one rule sharing an endpoint
+        router = Router([Rule("a").add_postal_range("10000", "20000").add_postal_range("10000", "30000")])
+        self.assertEqual(router.route(make_lead(postalcode="25000")).dealer, "a")
+        self.assertIsNone(router.route(make_lead(postalcode="30001")))
+
+        router = Router([Rule("a").add_postal_range("10000", "30000").add_postal_range("20000", "30000")])
+        self.assertEqual(router.route(make_lead(postalcode="25000")).dealer, "a")
+        self.assertIsNone(router.route(make_lead(postalcode="40000")))
+
+    def test_provider(self):
+        router = Router([Rule("p2").set_provider_ids("P-2")])
+        self.assertIsNone(router.route(make_lead()))
+        self.assertEqual(router.route(make_lead(provider_id="P-2")).dealer, "p2")
+
+    def test_invalid_range(self):
+        with self.assertRaises(ValueError):
+            Rule("x").add_postal_range("2", "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
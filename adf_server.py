@@ -0,0 +1,401 @@
+from typing import Dict, List, Tuple
+from concurrent.futures import Executor
+import asyncio
+from lxml import etree
+from adf import Prospect, iter_prospects
+from adf_parallel import shared_executor
+
+# an asyncio http endpoint lead providers POST adf documents to. parsing happens in a worker pool so the event loop
+# only moves bytes, and the parsed prospects go into a bounded queue that consumers drain in batches with
+# next_batch(). once the queue (or the number of documents being parsed) is full, new posts get a 429 instead of
+# piling up in memory. requests a client pipelines on one connection are parsed concurrently, and the responses
+# that are ready together are acknowledged with a single write.
+#
+# NOTE: this only speaks as much HTTP/1.1 as lead providers need (POST with a content-length or chunked body,
+# keep-alive). it's meant to sit behind a proper reverse proxy that handles tls and anything unusual
+
+
+
+
+_REASONS = {
+  202: "Accepted",
+  400: "Bad Request",
+  404: "Not Found",
+  405: "Method Not Allowed",
+  413: "Payload Too Large",
+  429: "Too Many Requests",
+  500: "Internal Server Error",
+}
+
+# marks that the next pipelined response hasn't been taken off the queue yet
+_NOT_TAKEN = object()
+
+_MAX_HEADERS = 100
+
+
+class _BadRequest(Exception):
+  def __init__(self, status: int, message: str):
+    super().__init__(message)
+    self.status = status
+
+
+# the prospects that could be read and (position, error) for the ones that couldn't
+def _parse_document(body: bytes) -> Tuple[List[Prospect], List[Tuple[int, ValueError]]]:
+  errors: List[Tuple[int, ValueError]] = []
+  return list(iter_prospects([body], errors)), errors
+
+
+def _done(value) -> asyncio.Future:
+  future = asyncio.get_running_loop().create_future()
+  future.set_result(value)
+  return future
+
+
+def _response(status: int, message: str, close: bool = False, headers: Dict[str, str] | None = None):
+  body = (message + "\n").encode("utf-8")
+  lines = ["HTTP/1.1 %d %s" % (status, _REASONS[status]),
+           "Content-Type: text/plain; charset=utf-8",
+           "Content-Length: %d" % len(body)]
+  if close:
+    lines.append("Connection: close")
+  for name, value in (headers or {}).items():
+    lines.append(name + ": " + value)
+  return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def _read_chunked(reader: asyncio.StreamReader, max_body_size: int):
+  chunks: List[bytes] = []
+  size = 0
+  while True:
+    line = await reader.readline()
+    try:
+      n = int(line.split(b";")[0].strip(), 16)
+    except ValueError:
+      raise _BadRequest(400, "invalid chunk size")
+
+    if n == 0:
+      # skip trailers
+      while (await reader.readline()).strip():
+        pass
+      return b"".join(chunks)
+
+    size += n
+    if size > max_body_size:
+      raise _BadRequest(413, "body too large")
+
+    chunks.append(await reader.readexactly(n))
+    await reader.readexactly(2)
+
+
+# (method, path, headers, body), or None if the client closed the connection between requests
+async def _read_request(reader: asyncio.StreamReader, max_body_size: int) -> Tuple[str, str, Dict[str, str], bytes] | None:
+  line = await reader.readline()
+  if not line:
+    return None
+
+  parts = line.decode("latin-1").split()
+  if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+    raise _BadRequest(400, "invalid request line")
+  method, path, _ = parts
+
+  headers: Dict[str, str] = {}
+  while True:
+    line = await reader.readline()
+    if line in (b"\r\n", b"\n", b""):
+      break
+    if len(headers) >= _MAX_HEADERS:
+      raise _BadRequest(400, "too many headers")
+    name, sep, value = line.decode("latin-1").partition(":")
+    if not sep:
+      raise _BadRequest(400, "invalid header")
+    headers[name.strip().lower()] = value.strip()
+
+  if headers.get("transfer-encoding", "").lower() == "chunked":
+    return method, path, headers, await _read_chunked(reader, max_body_size)
+
+  try:
+    length = int(headers.get("content-length", "0"))
+  except ValueError:
+    raise _BadRequest(400, "invalid content-length")
+  if length < 0:
+    raise _BadRequest(400, "invalid content-length")
+  if length > max_body_size:
+    raise _BadRequest(413, "body too large")
+
+  return method, path, headers, await reader.readexactly(length)
+
+
+class IngestStats:
+  def __init__(self):
+    self.requests = 0
+    self.accepted = 0
+    self.prospects = 0
+    self.rejected = 0
+    self.invalid = 0
+    # prospects skipped because they couldn't be read, the rest of their document is still accepted
+    self.invalid_prospects = 0
+    # requests that hit an unexpected error, they get a 500
+    self.failed = 0
+
+  def __repr__(self):
+    return ("IngestStats(requests=%d, accepted=%d, prospects=%d, rejected=%d, invalid=%d, invalid_prospects=%d, "
+            "failed=%d)") % (self.requests, self.accepted, self.prospects, self.rejected, self.invalid,
+                             self.invalid_prospects, self.failed)
+
+
+class IngestServer:
+  def __init__(self,
+               queue_size: int = 10000,
+               executor: Executor | None = None,
+               max_pending: int = 64,
+               max_body_size: int = 1024 * 1024,
+               path: str | None = None,
+               max_pipelined: int = 16,
+  ):
+    if queue_size < 1:
+      # asyncio.Queue(0) would be unbounded
+      raise ValueError("queue_size must be at least 1")
+
+    # the executor does the parsing, a ProcessPoolExecutor works as well as the default thread pool
+    self.executor = executor or shared_executor()
+    self.max_pending = max_pending
+    self.max_body_size = max_body_size
+    # only posts to this path are accepted, None accepts any path
+    self.path = path
+    # how many requests one connection may have in flight before the server stops reading from it
+    self.max_pipelined = max_pipelined
+    self.stats = IngestStats()
+    # prospects that were accepted and haven't been picked up by a consumer yet
+    self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+    self.__pending = 0
+    self.__server: asyncio.Server | None = None
+    # connection handler task -> its writer
+    self.__connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+  async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.Server:
+    self.__server = await asyncio.start_server(self.__handle, host, port)
+    return self.__server
+
+  # stops accepting connections, then closes the open ones and waits for their handlers to finish
+  async def close(self):
+    if self.__server is not None:
+      self.__server.close()
+      await self.__server.wait_closed()
+
+    for writer in list(self.__connections.values()):
+      writer.close()
+    await asyncio.gather(*self.__connections, return_exceptions=True)
+
+  # waits for at least one prospect, then takes up to max_size without waiting any further.
+  # returns an empty list if nothing arrived within timeout
+  async def next_batch(self, max_size: int = 100, timeout: float | None = None) -> List[Prospect]:
+    try:
+      first = await asyncio.wait_for(self.queue.get(), timeout)
+    except asyncio.TimeoutError:
+      return []
+
+    batch = [first]
+    while len(batch) < max_size and not self.queue.empty():
+      batch.append(self.queue.get_nowait())
+    return batch
+
+  def __full(self, needed: int = 1):
+    return self.queue.maxsize - self.queue.qsize() < needed
+
+  async def __ingest(self, body: bytes):
+    # rejecting before parsing keeps overloaded servers from doing work they'd throw away
+    if self.__pending >= self.max_pending or self.__full():
+      return _response(429, "busy", headers={"Retry-After": "1"}), "rejected"
+
+    self.__pending += 1
+    try:
+      prospects, errors = await asyncio.get_running_loop().run_in_executor(self.executor, _parse_document, body)
+    except (ValueError, etree.XMLSyntaxError) as e:
+      return _response(400, "invalid adf: " + str(e)), "invalid"
+    finally:
+      self.__pending -= 1
+
+    if len(prospects) == 0:
+      return _response(400, "invalid adf: " + (str(errors[0][1]) if errors else "no prospects")), "invalid"
+
+    # retrying a document that can never fit in the queue wouldn't help
+    if len(prospects) > self.queue.maxsize:
+      return _response(413, "too many prospects in one document"), "invalid"
+
+    # the queue may have filled up while this document was being parsed
+    if self.__full(len(prospects)):
+      return _response(429, "busy", headers={"Retry-After": "1"}), "rejected"
+
+    for p in prospects:
+      self.queue.put_nowait(p)
+    self.stats.prospects += len(prospects)
+    if errors:
+      self.stats.invalid_prospects += len(errors)
+      return _response(202, "accepted %d, skipped %d invalid (prospect %d: %s)" % (
+        len(prospects), len(errors), errors[0][0], errors[0][1])), "accepted"
+    return _response(202, "accepted %d" % len(prospects)), "accepted"
+
+  async def __ingest_counted(self, body: bytes):
+    # anything unexpected (a bug, a broken executor) answers this request with a 500 instead of dropping the
+    # connection along with every request pipelined behind it
+    try:
+      response, outcome = await self.__ingest(body)
+    except Exception as e:
+      response, outcome = _response(500, "internal error: " + type(e).__name__), "failed"
+    setattr(self.stats, outcome, getattr(self.stats, outcome) + 1)
+    return response
+
+  # writes the responses in request order. every response that's already done when the first one is written
+  # goes out in the same write, so a client pipelining requests gets its acknowledgements in batches
+  async def __respond(self, writer: asyncio.StreamWriter, pending: asyncio.Queue):
+    error: BaseException | None = None
+    item = await pending.get()
+    while item is not None:
+      try:
+        batch = [await item]
+      except Exception as e:
+        batch = []
+        error = error or e
+
+      item = _NOT_TAKEN
+      while not pending.empty():
+        item = pending.get_nowait()
+        if item is None or not item.done():
+          break
+        try:
+          batch.append(item.result())
+        except Exception as e:
+          error = error or e
+        item = _NOT_TAKEN
+
+      if error is None:
+        try:
+          writer.write(b"".join(batch))
+          await writer.drain()
+        except ConnectionError as e:
+          error = e
+
+      if error is not None:
+        # closing the transport ends the reading side as well, the rest of the queue is only drained
+        writer.close()
+
+      if item is _NOT_TAKEN:
+        item = await pending.get()
+
+    if error is not None and not isinstance(error, ConnectionError):
+      raise error
+
+  async def __handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # futures of the responses, in request order. None tells the responder the connection is done
+    pending: asyncio.Queue = asyncio.Queue(self.max_pipelined)
+    responder = asyncio.create_task(self.__respond(writer, pending))
+    task = asyncio.current_task()
+    self.__connections[task] = writer
+
+    try:
+      while True:
+        try:
+          request = await _read_request(reader, self.max_body_size)
+        except _BadRequest as e:
+          await pending.put(_done(_response(e.status, str(e), close=True)))
+          self.stats.invalid += 1
+          break
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+          break
+
+        if request is None:
+          break
+
+        method, path, headers, body = request
+        self.stats.requests += 1
+        close = headers.get("connection", "").lower() == "close"
+
+        if self.path is not None and path.split("?")[0] != self.path:
+          await pending.put(_done(_response(404, "not found", close)))
+        elif method != "POST":
+          await pending.put(_done(_response(405, "only POST is supported", close, {"Allow": "POST"})))
+        else:
+          await pending.put(asyncio.ensure_future(self.__ingest_counted(body)))
+
+        if close:
+          break
+
+      await pending.put(None)
+      await responder
+    finally:
+      # only does something if the handler itself failed or was cancelled
+      responder.cancel()
+      writer.close()
+      del self.__connections[task]
+
+
+
+async def _client(host: str, port: int, body: bytes, requests: int, pipeline: int, latencies: List[float], statuses: Dict[int, int]):
+  import time
+
+  reader, writer = await asyncio.open_connection(host, port)
+  request = ("POST /adf HTTP/1.1\r\nHost: %s\r\nContent-Type: text/xml\r\nContent-Length: %d\r\n\r\n"
+             % (host, len(body))).encode("latin-1") + body
+
+  # pipeline requests are sent at once and then all their responses are read
+  for _ in range(requests // pipeline):
+    start = time.perf_counter()
+    writer.write(request * pipeline)
+    await writer.drain()
+
+    for _ in range(pipeline):
+      status = int((await reader.readline()).split()[1])
+      length = 0
+      while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+          break
+        if line.lower().startswith(b"content-length:"):
+          length = int(line.split(b":")[1])
+      await reader.readexactly(length)
+
+      latencies.append(time.perf_counter() - start)
+      statuses[status] = statuses.get(status, 0) + 1
+
+  writer.close()
+
+
+async def _load_test(clients: int, requests: int, pipeline: int = 1, max_pending: int = 64):
+  import time
+  from adf import Adf, Vehicle, Customer, Contact, Name, Email
+
+  server = IngestServer(queue_size=5000, max_pending=max_pending, path="/adf")
+  s = await server.start("127.0.0.1", 0)
+  port = s.sockets[0].getsockname()[1]
+
+  consumed = 0
+
+  async def consume():
+    nonlocal consumed
+    while True:
+      consumed += len(await server.next_batch(500))
+
+  consumer = asyncio.create_task(consume())
+  prospect = (Prospect().add_vehicle(Vehicle(2020, "Toyota", "Camry"))
+    .set_customer(Customer(Contact().add_name(Name("Jane")).add_email(Email("jane@example.com")))))
+  body = etree.tostring(Adf(prospect).to_xml(), xml_declaration=True, encoding="utf-8")
+  latencies: List[float] = []
+  statuses: Dict[int, int] = {}
+
+  start = time.perf_counter()
+  await asyncio.gather(*[_client("127.0.0.1", port, body, requests, pipeline, latencies, statuses) for _ in range(clients)])
+  elapsed = time.perf_counter() - start
+
+  consumer.cancel()
+  await server.close()
+
+  latencies.sort()
+  print("%d clients x %d requests, pipeline %d: %.0f requests/sec, p50 %.1fms, p99 %.1fms, statuses %s, %d consumed"
+        % (clients, requests, pipeline, len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000,
+           latencies[int(len(latencies) * 0.99)] * 1000, statuses, consumed))
+
+
+if __name__ == "__main__":
+  asyncio.run(_load_test(clients=50, requests=200))
+  asyncio.run(_load_test(clients=50, requests=200, pipeline=8, max_pending=512))
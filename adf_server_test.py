@@ -0,0 +1,140 @@
+import unittest
+import asyncio
+from concurrent.futures import Executor
+
+from lxml import etree
+
+from adf_server import IngestServer
+from adf_test import make_prospect
+
+
+def make_body(count=1):
+    return b"<adf>" + b"".join(etree.tostring(make_prospect(vin=str(i)).to_xml()) for i in range(count)) + b"</adf>"
+
+
+async def post(port, body, path="/adf", method="POST", chunked=False):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    if chunked:
+        head = "%s %s HTTP/1.1\r\nTransfer-Encoding: chunked\r\nConnection: close\r\n\r\n" % (method, path)
+        payload = b"".join(b"%x\r\n%s\r\n" % (len(body[i:i + 10]), body[i:i + 10]) for i in range(0, len(body), 10)) + b"0\r\n\r\n"
+    else:
+        head = "%s %s HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % (method, path, len(body))
+        payload = body
+    writer.write(head.encode() + payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split()[1])
+
+
+async def post_pipelined(port, requests):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = b""
+    for i, (method, body) in enumerate(requests):
+        close = "Connection: close\r\n" if i == len(requests) - 1 else ""
+        payload += ("%s /adf HTTP/1.1\r\nContent-Length: %d\r\n%s\r\n" % (method, len(body), close)).encode() + body
+    writer.write(payload)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return [int(r.split()[0]) for r in response.split(b"HTTP/1.1 ")[1:]]
+
+
+class IngestServerTest (unittest.TestCase):
+    def run_server(self, test, **kwargs):
+        async def run():
+            server = IngestServer(path="/adf", **kwargs)
+            s = await server.start("127.0.0.1", 0)
+            try:
+                await test(server, s.sockets[0].getsockname()[1])
+            finally:
+                await server.close()
+        asyncio.run(run())
+
+    def test_accepts_and_batches(self):
+        async def test(server, port):
+            self.assertEqual(await post(port, make_body(3)), 202)
+            self.assertEqual(await post(port, make_body(2), chunked=True), 202)
+
+            batch = await server.next_batch(max_size=4)
+            self.assertEqual([p.get_vehicles()[0].get_vin() for p in batch], ["0", "1", "2", "0"])
+            self.assertEqual(len(await server.next_batch()), 1)
+            self.assertEqual(await server.next_batch(timeout=0.01), [])
+            self.assertEqual(server.stats.prospects, 5)
+
+        self.run_server(test)
+
+    def test_skips_invalid_prospects(self):
+        async def test(server, port):
+            body = make_body(2).replace(b"</adf>", b"<prospect><customer/></prospect></adf>")
+            self.assertEqual(await post(port, body), 202)
+            self.assertEqual(len(await server.next_batch()), 2)
+            self.assertEqual((server.stats.prospects, server.stats.invalid_prospects), (2, 1))
+
+        self.run_server(test)
+
+    def test_pipelined(self):
+        async def test(server, port):
+            requests = [("POST", make_body(1)), ("PUT", b""), ("POST", b"<adf>"), ("POST", make_body(2))]
+            self.assertEqual(await post_pipelined(port, requests), [202, 405, 400, 202])
+            self.assertEqual(len(await server.next_batch()), 3)
+            self.assertEqual((server.stats.accepted, server.stats.invalid), (2, 1))
+
+        self.run_server(test)
+
+    def test_unexpected_error(self):
+        class BrokenExecutor (Executor):
+            def submit(self, fn, *args, **kwargs):
+                raise RuntimeError("broken")
+
+        async def test(server, port):
+            requests = [("POST", make_body(1)), ("POST", make_body(1))]
+            self.assertEqual(await post_pipelined(port, requests), [500, 500])
+            self.assertEqual((server.stats.failed, server.stats.accepted), (2, 0))
+
+        self.run_server(test, executor=BrokenExecutor())
+
+    def test_close_with_open_connection(self):
+        async def run():
+            server = IngestServer()
+            s = await server.start("127.0.0.1", 0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", s.sockets[0].getsockname()[1])
+            await asyncio.sleep(0.01)
+            await asyncio.wait_for(server.close(), 1)
+            self.assertEqual(await reader.read(), b"")
+            writer.close()
+        asyncio.run(run())
+
+    def test_backpressure(self):
+        async def test(server, port):
+            self.assertEqual(await post(port, make_body(2)), 202)
+            self.assertEqual(await post(port, make_body(1)), 429)
+            await server.next_batch()
+            self.assertEqual(await post(port, make_body(1)), 202)
+            self.assertEqual(server.stats.rejected, 1)
+
+        self.run_server(test, queue_size=2)
+
+    def test_document_larger_than_queue(self):
+        async def test(server, port):
+            self.assertEqual(await post(port, make_body(3)), 413)
+
+        self.run_server(test, queue_size=2)
+        with self.assertRaises(ValueError):
+            IngestServer(queue_size=0)
+
+    def test_errors(self):
+        async def test(server, port):
+            self.assertEqual(await post(port, b"<adf><prospect>"), 400)
+            self.assertEqual(await post(port, b"<adf></adf>"), 400)
+            self.assertEqual(await post(port, b"<adf><prospect><customer/></prospect></adf>"), 400)
+            self.assertEqual(await post(port, make_body(), method="PUT"), 405)
+            self.assertEqual(await post(port, make_body(), path="/other"), 404)
+            self.assertEqual(await post(port, make_body(20)), 413)
+            self.assertEqual(server.queue.qsize(), 0)
+
+        self.run_server(test, max_body_size=5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
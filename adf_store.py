@@ -0,0 +1,179 @@
+from typing import Dict, List, Iterable, Tuple
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from adf import Prospect, _to_utc, normalize_email, normalize_phone
+
+# an in-memory store of recent prospects with secondary indexes, for dashboard style lookups
+# ("all leads for this vin", "all toyota leads from provider P last week") without scanning every lead
+
+
+
+
+# the hash indexed fields, see LeadStore.query()
+FIELDS = ["vin", "email", "phone", "vendor_id", "provider_id", "make"]
+
+
+def _normalize_make(make: str):
+  return make.strip().lower()
+
+
+def _normalize_vin(vin: str):
+  return vin.strip().upper()
+
+
+_NORMALIZERS = {
+  "vin": _normalize_vin,
+  "email": normalize_email,
+  "phone": normalize_phone,
+  "vendor_id": str.strip,
+  "provider_id": str.strip,
+  "make": _normalize_make,
+}
+
+
+# every (field, value) pair a prospect is indexed under
+def _keys(prospect: Prospect) -> List[Tuple[str, str]]:
+  keys = set()
+
+  for vehicle in prospect.get_vehicles():
+    if vehicle.get_vin():
+      keys.add(("vin", _normalize_vin(vehicle.get_vin())))
+    if vehicle.get_make():
+      keys.add(("make", _normalize_make(vehicle.get_make())))
+
+  customer = prospect.get_customer()
+  if customer != None:
+    contact = customer.get_contact()
+    for email in contact.emails:
+      if email.value:
+        keys.add(("email", normalize_email(email.value)))
+    for phone in contact.phone_numbers:
+      if phone.value and normalize_phone(phone.value):
+        keys.add(("phone", normalize_phone(phone.value)))
+
+  vendor = prospect.get_vendor()
+  if vendor != None and vendor.get_id() != None and vendor.get_id().value:
+    keys.add(("vendor_id", vendor.get_id().value.strip()))
+
+  provider = prospect.get_provider()
+  if provider != None and provider.id != None and provider.id.value:
+    keys.add(("provider_id", provider.id.value.strip()))
+
+  return list(keys)
+
+
+class LeadStore:
+  def __init__(self):
+    self.__next_id = 0
+    self.__leads: Dict[int, Prospect] = {}
+    self.__dates: Dict[int, datetime] = {}
+    self.__keys: Dict[int, List[Tuple[str, str]]] = {}
+    # field -> value -> lead ids
+    self.__indexes: Dict[str, Dict[str, set]] = {field: {} for field in FIELDS}
+    # (date, lead id), sorted
+    self.__by_date: List[Tuple[datetime, int]] = []
+
+  def __len__(self):
+    return len(self.__leads)
+
+  # leads are ordered by their requestdate in utc, or by the time they were added if they don't have one
+  def add(self, prospect: Prospect) -> int:
+    lead_id = self.__next_id
+    self.__next_id += 1
+
+    date = _to_utc(prospect.get_request_date() or datetime.now(timezone.utc))
+    keys = _keys(prospect)
+
+    self.__leads[lead_id] = prospect
+    self.__dates[lead_id] = date
+    self.__keys[lead_id] = keys
+
+    for field, value in keys:
+      self.__indexes[field].setdefault(value, set()).add(lead_id)
+
+    # leads mostly arrive in date order, which makes this an append
+    if not self.__by_date or self.__by_date[-1][0] <= date:
+      self.__by_date.append((date, lead_id))
+    else:
+      insort(self.__by_date, (date, lead_id))
+
+    return lead_id
+
+  def add_many(self, prospects: Iterable[Prospect]) -> List[int]:
+    return [self.add(p) for p in prospects]
+
+  def get(self, lead_id: int) -> Prospect | None:
+    return self.__leads.get(lead_id)
+
+  def __unindex(self, lead_id: int):
+    del self.__leads[lead_id]
+    del self.__dates[lead_id]
+
+    for field, value in self.__keys.pop(lead_id):
+      ids = self.__indexes[field][value]
+      ids.discard(lead_id)
+      if not ids:
+        del self.__indexes[field][value]
+
+  def remove(self, lead_id: int):
+    if lead_id not in self.__leads:
+      raise KeyError(lead_id)
+
+    i = bisect_left(self.__by_date, (self.__dates[lead_id], lead_id))
+    del self.__by_date[i]
+    self.__unindex(lead_id)
+
+  # drops every lead dated before cutoff, returns how many were dropped
+  def evict_before(self, cutoff: datetime) -> int:
+    cutoff = _to_utc(cutoff)
+    n = bisect_left(self.__by_date, (cutoff, -1))
+
+    for _, lead_id in self.__by_date[:n]:
+      self.__unindex(lead_id)
+    del self.__by_date[:n]
+
+    return n
+
+  # ids of the leads matching every given field and dated since <= date < until, oldest first.
+  # e.g. query_ids(provider_id="P-1", make="Toyota", since=datetime(2024, 5, 1)). naive dates are taken to be utc
+  def query_ids(self, since: datetime | None = None, until: datetime | None = None, **fields: str) -> List[int]:
+    for field in fields:
+      if field not in self.__indexes:
+        raise ValueError("can't query by " + field)
+
+    since = _to_utc(since) if since is not None else None
+    until = _to_utc(until) if until is not None else None
+
+    lo = 0 if since is None else bisect_left(self.__by_date, (since, -1))
+    hi = len(self.__by_date) if until is None else bisect_left(self.__by_date, (until, -1))
+
+    if not fields:
+      return [lead_id for _, lead_id in self.__by_date[lo:hi]]
+
+    # intersect starting from the smallest index, it bounds the size of everything after it
+    sets = []
+    for field, value in fields.items():
+      ids = self.__indexes[field].get(_NORMALIZERS[field](value))
+      if not ids:
+        return []
+      sets.append(ids)
+    sets.sort(key=len)
+
+    # a narrow date range over common values ("toyota leads in the last hour") has fewer leads in range than
+    # in the smallest set, walking the range is cheaper then and already in date order
+    if hi - lo < len(sets[0]):
+      return [lead_id for _, lead_id in self.__by_date[lo:hi] if all(lead_id in ids for ids in sets)]
+
+    matches = set(sets[0])
+    for ids in sets[1:]:
+      matches &= ids
+      if not matches:
+        return []
+
+    dates = self.__dates
+    result = [i for i in matches if (since is None or dates[i] >= since) and (until is None or dates[i] < until)]
+    result.sort(key=lambda i: (dates[i], i))
+    return result
+
+  def query(self, since: datetime | None = None, until: datetime | None = None, **fields: str) -> List[Prospect]:
+    return [self.__leads[i] for i in self.query_ids(since, until, **fields)]
@@ -0,0 +1,72 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import adf
+from adf_store import LeadStore
+from adf_test import make_prospect
+
+
+def make_lead(day, vin="VIN1", email="jane@example.com", make="Toyota", provider_id="P-1"):
+    prospect = make_prospect(vin=vin, email=email, make=make).set_request_date(datetime(2024, 5, day))
+    return prospect.set_provider(adf.Provider().add_name(adf.Name("LeadCo")).set_id(adf.Id(provider_id)))
+
+
+class LeadStoreTest (unittest.TestCase):
+    def setUp(self):
+        self.store = LeadStore()
+        self.ids = self.store.add_many([
+            make_lead(3, vin="A"),
+            make_lead(1, vin="B", email="BOB@example.com", make="Honda"),
+            make_lead(2, vin="A", provider_id="P-2"),
+            make_lead(5, vin="C", email="bob@example.com"),
+        ])
+
+    def test_field_queries(self):
+        self.assertEqual(self.store.query_ids(vin="a"), [self.ids[2], self.ids[0]])
+        self.assertEqual(self.store.query_ids(email="Bob@Example.com"), [self.ids[1], self.ids[3]])
+        self.assertEqual(self.store.query_ids(phone="(555) 0100"), [self.ids[1], self.ids[2], self.ids[0], self.ids[3]])
+        self.assertEqual(self.store.query_ids(vendor_id="D-1", make="honda"), [self.ids[1]])
+        self.assertEqual(self.store.query_ids(vin="nope"), [])
+        self.assertIs(self.store.query(vin="C")[0], self.store.get(self.ids[3]))
+
+    def test_composite_with_dates(self):
+        self.assertEqual(self.store.query_ids(provider_id="P-1", make="toyota", since=datetime(2024, 5, 3)),
+                         [self.ids[0], self.ids[3]])
+        self.assertEqual(self.store.query_ids(provider_id="P-1", make="toyota", until=datetime(2024, 5, 3)), [])
+        # the smallest set is narrower than the date range
+        self.assertEqual(self.store.query_ids(vin="A", since=datetime(2024, 5, 1)), [self.ids[2], self.ids[0]])
+        self.assertEqual(self.store.query_ids(make="honda", until=datetime(2024, 5, 1)), [])
+        self.assertEqual(self.store.query_ids(since=datetime(2024, 5, 2), until=datetime(2024, 5, 5)),
+                         [self.ids[2], self.ids[0]])
+
+    def test_evict(self):
+        self.assertEqual(self.store.evict_before(datetime(2024, 5, 3)), 2)
+        self.assertEqual(len(self.store), 2)
+        self.assertEqual(self.store.query_ids(vin="A"), [self.ids[0]])
+        self.assertEqual(self.store.query_ids(make="honda"), [])
+        self.assertIsNone(self.store.get(self.ids[1]))
+
+    def test_remove(self):
+        self.store.remove(self.ids[0])
+        self.assertEqual(self.store.query_ids(vin="A"), [self.ids[2]])
+        self.assertEqual(self.store.query_ids(), [self.ids[1], self.ids[2], self.ids[3]])
+        with self.assertRaises(KeyError):
+            self.store.remove(self.ids[0])
+
+    def test_mixed_timezones(self):
+        # 2024-05-02 20:00 at -08:00 is 2024-05-03 04:00 utc
+        late = make_lead(2, vin="D").set_request_date(datetime(2024, 5, 2, 20, tzinfo=timezone(timedelta(hours=-8))))
+        lead_id = self.store.add(late)
+        undated = self.store.add(adf.Prospect().add_vehicle(adf.Vehicle(2020, "Toyota", "Camry").set_vin("E")))
+
+        self.assertEqual(self.store.query_ids(since=datetime(2024, 5, 3), until=datetime(2024, 5, 4)), [self.ids[0], lead_id])
+        self.assertEqual(self.store.query_ids()[-1], undated)
+        self.store.remove(lead_id)
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            self.store.query_ids(color="red")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,12 @@
 
 import unittest
+import asyncio
+from datetime import datetime
+from decimal import Decimal
+
+from lxml import etree
+
+import adf
 
 # test to do:
 # any type checking is done
@@ -29,7 +36,364 @@ class ADFTest (unittest.TestCase):
 
 
 
+def make_prospect(vin="1HGCM82633A004352", email="jane@example.com", make="Toyota"):
+    contact = (adf.Contact()
+        .add_name(adf.Name("Jane").set_part("first"))
+        .add_name(adf.Name("Doe").set_part("last"))
+        .add_email(adf.Email(email))
+        .add_phone_number(adf.PhoneNumber("555-0100").set_type("cellphone"))
+        .add_address(adf.Address().add_street("1 Main St").set_city("Springfield").set_postalcode("12345")))
+
+    vehicle = (adf.Vehicle(2020, make, "Camry")
+        .set_interest("buy")
+        .set_status("new")
+        .set_vin(vin)
+        .set_price(adf.Price(25000).set_type("quote").set_currency("usd"))
+        .add_option("Sunroof", "SR1", "S-1", 1, adf.Price(900))
+        .set_comments("call after 5pm"))
+
+    vendor_contact = adf.Contact().add_name(adf.Name("Sales")).add_email(adf.Email("sales@dealer.example"))
+
+    return (adf.Prospect()
+        .set_id(adf.Id("42").set_source("web"))
+        .set_request_date(datetime(2024, 5, 1, 12, 30))
+        .add_vehicle(vehicle)
+        .set_customer(adf.Customer(contact).set_comments("hi"))
+        .set_vendor(adf.Vendor("Springfield Toyota", vendor_contact).set_id(adf.Id("D-1")))
+        .set_provider(adf.Provider().set_id(adf.Id("P-1")).add_name(adf.Name("LeadCo"))))
+
+
+def to_bytes(prospect):
+    return etree.tostring(adf.Adf(prospect).to_xml())
+
+
+class ParseTest (unittest.TestCase):
+    def test_round_trip(self):
+        xml = to_bytes(make_prospect())
+        self.assertEqual(etree.tostring(adf.Adf.from_xml_str(xml).to_xml()), xml)
+
+    def test_round_trip_str_with_declaration(self):
+        xml = etree.tostring(adf.Adf(make_prospect()).to_xml(), xml_declaration=True, encoding="utf-8").decode()
+        self.assertEqual(to_bytes(adf.Adf.from_xml_str(xml).get_prospect()), to_bytes(make_prospect()))
+
+    def test_dtd_attribute_values(self):
+        xml = (to_bytes(make_prospect())
+            .replace(b'type="cellphone"', b'type="voice" time="sometime" preferredcontact="yes"')
+            .replace(b'part="first"', b'part="surname" type="robot"'))
+        contact = adf.Adf.from_xml_str(xml).get_prospect().get_customer().get_contact()
+        self.assertEqual((contact.phone_numbers[0].type, contact.phone_numbers[0].time), ("phone", None))
+        self.assertEqual((contact.names[0].part, contact.names[0].type), ("last", None))
+
+    def test_unknown_values_are_dropped(self):
+        xml = (to_bytes(make_prospect().set_status("resend"))
+            .replace(b'status="resend"', b'status="again"')
+            .replace(b'interest="buy"', b'interest="Buy"')
+            .replace(b"<comments>call", b"<condition>Clean</condition><finance><method>rent</method><amount>1</amount></finance><comments>call")
+            .replace(b"<requestdate>2024-05-01T12:30:00", b"<requestdate>yesterday")
+            .replace(b"<contact>", b'<contact primarycontact="yes">', 1)
+            .replace(b"<address>", b'<address type="mars">'))
+        self.assertIn(b"<condition>Clean</condition>", xml)
+        prospect = adf.Adf.from_xml_str(xml).get_prospect()
+        vehicle = prospect.get_vehicles()[0]
+        self.assertEqual((prospect.get_status(), prospect.get_request_date()), (None, None))
+        self.assertEqual((vehicle.get_interest(), vehicle.get_status(), vehicle.get_make()), (None, "new", "Toyota"))
+        self.assertIsNone(vehicle.to_xml().find("condition"))
+        self.assertIsNone(vehicle.get_finance())
+        self.assertIsNone(prospect.get_customer().get_contact().addresses[0].address_type)
+
+    def test_every_id_is_kept(self):
+        prospect = make_prospect()
+        prospect.add_id(adf.Id("43").set_source("crm"))
+        prospect.get_vehicles()[0].add_id(adf.Id("V-1")).add_id(adf.Id("V-2"))
+        xml = to_bytes(prospect)
+        parsed = adf.Adf.from_xml_str(xml).get_prospect()
+        self.assertEqual([i.value for i in parsed.get_ids()], ["42", "43"])
+        self.assertEqual([i.value for i in parsed.get_vehicles()[0].get_ids()], ["V-1", "V-2"])
+        self.assertEqual(to_bytes(parsed), xml)
+
+    def test_timeframe_with_only_a_description(self):
+        prospect = make_prospect()
+        prospect.get_customer().set_timeframe(None, None, "next month")
+        xml = to_bytes(prospect)
+        self.assertIn(b"<timeframe><description>next month</description></timeframe>", xml)
+        self.assertEqual(to_bytes(adf.Adf.from_xml_str(xml).get_prospect()), xml)
+        with self.assertRaises(ValueError):
+            adf.Customer(adf.Contact()).set_timeframe(None, None, None)
+
+    def test_missing_prospect(self):
+        with self.assertRaises(ValueError):
+            adf.Adf.from_xml_str("<adf></adf>")
+
+    def test_feed_parser_yields_each_prospect(self):
+        body = b"<adf>" + b"".join(etree.tostring(make_prospect(vin=str(i)).to_xml()) for i in range(3)) + b"</adf>"
+        parser = adf.ProspectFeedParser()
+        seen = []
+
+        for i in range(0, len(body), 7):
+            seen.extend(parser.feed(body[i:i + 7]))
+        seen.extend(parser.close())
+
+        self.assertEqual([p.to_xml().findtext("vehicle/vin") for p in seen], ["0", "1", "2"])
+
+    def test_feed_parser_skips_invalid_prospects(self):
+        good = etree.tostring(make_prospect().to_xml())
+        body = b"<adf>" + good + b"<prospect><customer/></prospect>" + good + b"</adf>"
+        parser = adf.ProspectFeedParser()
+        self.assertEqual(len(parser.feed(body)), 2)
+        self.assertEqual([position for position, _ in parser.errors], [1])
+
+        errors = []
+        self.assertEqual(len(list(adf.iter_prospects([body], errors))), 2)
+        self.assertEqual(len(errors), 1)
+
+        seen = []
+        with self.assertRaises(ValueError):
+            for prospect in adf.iter_prospects([body]):
+                seen.append(prospect)
+        self.assertEqual(len(seen), 2)
+
+    def test_feed_parser_truncated(self):
+        parser = adf.ProspectFeedParser()
+        parser.feed(b"<adf><prospect>")
+        with self.assertRaises(etree.XMLSyntaxError):
+            parser.close()
+
+    def test_aiter_prospects(self):
+        body = b"<adf>" + etree.tostring(make_prospect().to_xml()) * 2 + b"</adf>"
+
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(body)
+            reader.feed_eof()
+            return [p async for p in adf.aiter_prospects(reader, chunk_size=16)]
+
+        self.assertEqual(len(asyncio.run(run())), 2)
+
+
+class DiffTest (unittest.TestCase):
+    def test_identical(self):
+        self.assertEqual(adf.diff(make_prospect(), make_prospect()), {})
+
+    def test_changed_field(self):
+        changes = make_prospect().diff(make_prospect(vin="OTHER"))
+        self.assertEqual(changes, {"vehicles[0].vin": ("1HGCM82633A004352", "OTHER")})
+
+    def test_added_vehicle(self):
+        new = make_prospect().add_vehicle(adf.Vehicle(2021, "Honda", "Civic"))
+        changes = make_prospect().diff(new)
+        self.assertEqual(list(changes), ["vehicles[1]"])
+        self.assertIsNone(changes["vehicles[1]"][0])
+
+    def test_price_precision(self):
+        new = make_prospect()
+        new.get_vehicles()[0].set_price(adf.Price("25000.00").set_type("quote").set_currency("USD"))
+        self.assertEqual(list(adf.diff(make_prospect(), new)), ["vehicles[0].price.value"])
+
+    def test_status_is_ignored(self):
+        self.assertEqual(make_prospect().diff(make_prospect().set_status("resend")), {})
+
+    def test_shared_subtree(self):
+        customer = adf.Customer(adf.Contact().add_name(adf.Name("Shared")))
+        old = make_prospect().set_customer(customer)
+        new = make_prospect().set_customer(customer)
+        self.assertEqual(old.diff(new), {})
+
+    def test_resend_status(self):
+        elem = make_prospect().set_status("resend").to_xml()
+        self.assertEqual(elem.get("status"), "resend")
+        self.assertEqual(adf.Prospect.from_xml(elem).to_xml().get("status"), "resend")
+        with self.assertRaises(ValueError):
+            adf.Prospect().set_status("old")
+
+
+class SanitizeTest (unittest.TestCase):
+    def tearDown(self):
+        adf.set_sanitizing(False)
+
+    def test_sanitize_text(self):
+        self.assertEqual(adf.sanitize_text("a\x00b\x1f"), "ab")
+        self.assertEqual(adf.sanitize_text("a\x00b", replacement="?"), "a?b")
+        self.assertEqual(adf.sanitize_text(" call\r\n after\t5pm\xa0 "), "call after 5pm")
+        self.assertEqual(adf.sanitize_text("line\nbreak\x0b", normalize_whitespace=False), "line\nbreak")
+        self.assertEqual(adf.sanitize_text("\ud800x\ufffe"), "x")
+
+    def test_clean_text_is_untouched(self):
+        value = "Jos\xe9 Smith, 1 Main St"
+        self.assertIs(adf.sanitize_text(value), value)
+
+    def test_sanitize_many(self):
+        self.assertEqual(adf.sanitize_many(["ok", None, "a\x07b"]), ["ok", None, "ab"])
+
+    def test_setters(self):
+        with self.assertRaises(ValueError):
+            adf.Vehicle(2020, "Toyota", "Camry").set_comments("bad\x08").to_xml()
+
+        adf.set_sanitizing(True)
+        vehicle = (adf.Vehicle(2020, "Toyota", "Camry")
+            .set_comments("bad\x08 comment")
+            .set_price_comment("\x1bcheap")
+            .add_option("Sun\x00roof", None, None, 1, adf.Price(10)))
+        elem = vehicle.to_xml()
+        self.assertEqual(elem.findtext("comments"), "bad comment")
+        self.assertEqual(elem.findtext("pricecomments"), "cheap")
+        self.assertEqual(elem.findtext("option/optionname"), "Sunroof")
+
+        address = adf.Address().add_street("1 Main\x0c St").set_city("Spring\nfield")
+        self.assertEqual(address.streets, ["1 Main St"])
+        self.assertEqual(address.city, "Spring field")
+        self.assertEqual(adf.Name("Jane\x00").value, "Jane")
+
+
+
+
+
+class VehicleRecordTest (unittest.TestCase):
+    def test_validation(self):
+        with self.assertRaises(ValueError):
+            adf.ColorCombination(None, None, 1)
+        with self.assertRaises(ValueError):
+            adf.Option("Sunroof", weighting="heavy")
+        with self.assertRaises(ValueError):
+            adf.Finance("rent", [])
+        with self.assertRaises(ValueError):
+            adf.Amount(300, "weekly")
+        with self.assertRaises(ValueError):
+            adf.ImageTag("")
+
+    def test_missing_values_are_not_written(self):
+        vehicle = (adf.Vehicle(2020, "Toyota", "Camry")
+            .add_color_combination("black", None, None)
+            .add_option("Sunroof", None, None, None, None))
+        elem = vehicle.to_xml()
+        self.assertIsNone(elem.find("colorcombination/exteriorcolor"))
+        self.assertIsNone(elem.find("colorcombination/preference"))
+        self.assertEqual([c.tag for c in elem.find("option")], ["optionname"])
+
+    def test_legacy_finance_dicts(self):
+        vehicle = adf.Vehicle(2020, "Toyota", "Camry").set_finance(
+            "lease", [{"amount": 300, "type": "monthly", "limit": "maximum", "currency": "usd"}], {"balance": 1000, "type": "residual"})
+        finance = vehicle.to_xml().find("finance")
+        self.assertEqual(finance.findtext("method"), "lease")
+        self.assertEqual(dict(finance.find("amount").attrib), {"type": "monthly", "limit": "maximum", "currency": "USD"})
+        self.assertEqual(finance.findtext("balance"), "1000")
+
+    def test_parsed_numbers_are_lenient(self):
+        xml = (to_bytes(make_prospect())
+            .replace(b"<weighting>1</weighting>", b"<weighting/>")
+            .replace(b"<option>", b"<option><optionname>Tow hitch</optionname><weighting>high</weighting></option><option>"))
+        options = adf.Adf.from_xml_str(xml).get_prospect().get_vehicles()[0].get_options()
+        self.assertEqual([(o.name, o.weighting) for o in options], [("Tow hitch", None), ("Sunroof", None)])
+
+    def test_records_round_trip(self):
+        vehicle = (adf.Vehicle(2020, "Toyota", "Camry")
+            .set_imagetag_record(adf.ImageTag("http://example.com/car.jpg", 640, 480, "front"))
+            .add_color_combination_record(adf.ColorCombination("black", "red", 1))
+            .set_finance_record(adf.Finance("finance", [adf.Amount(5000, "downpayment")], adf.Balance(20000, "finance"))))
+        for i in range(30):
+            vehicle.add_option_record(adf.Option("Option " + str(i), "C" + str(i), None, i, adf.Price(i * 10)))
+
+        parsed = adf.Vehicle.from_xml(vehicle.to_xml())
+        self.assertEqual(adf.diff(vehicle, parsed), {})
+        self.assertEqual(etree.tostring(parsed.to_xml()), etree.tostring(vehicle.to_xml()))
+
+
+class MoneyTest (unittest.TestCase):
+    def tearDown(self):
+        adf.set_money_quantization(None)
+
+    def test_values(self):
+        self.assertEqual(adf.Price(25000).to_xml().text, "25000")
+        self.assertEqual(adf.Price(19999.99).value, Decimal("19999.99"))
+        self.assertEqual(adf.Price(" 1E+3 ").to_xml().text, "1000")
+        self.assertEqual(adf.Amount("300.5").to_xml().text, "300.5")
+        for bad in ["", "abc", "NaN", None]:
+            with self.assertRaises(ValueError):
+                adf.Price(bad)
+
+    def test_quantization(self):
+        adf.set_money_quantization(2)
+        self.assertEqual(adf.Price(19999.999999).to_xml().text, "20000.00")
+        self.assertEqual(adf.Balance("0.125").value, Decimal("0.13"))
+        with self.assertRaises(ValueError):
+            adf.Price("1e30")
+
+    def test_currency_codes(self):
+        self.assertEqual(adf.Price(1).set_currency(" eur").currency, "EUR")
+        self.assertIs(adf.currency_code("cad"), adf.currency_code("CAD"))
+        with self.assertRaises(ValueError):
+            adf.Price(1).set_currency("XXY")
+        with self.assertRaises(ValueError):
+            adf.Amount(1, currency="dollars")
+
+    def test_convert_prices(self):
+        adf.set_money_quantization(2)
+        prices = [
+            adf.Price(100).set_currency("EUR"),
+            adf.Price(100),
+            adf.Price(5).set_delta("percentage"),
+            adf.Amount(300, "monthly", currency="GBP"),
+            adf.Price(7).set_currency("CAD"),
+        ]
+        adf.convert_prices(prices, {"eur": 1.1, "GBP": "1.3333", "USD": "0.7"}, "CAD", default_currency="USD")
+
+        self.assertEqual([p.to_xml().text for p in prices], ["110.00", "70.00", "5.00", "399.99", "7.00"])
+        self.assertEqual([p.currency for p in prices], ["CAD", "CAD", None, "CAD", "CAD"])
+
+    def test_convert_prices_missing_rate(self):
+        prices = [adf.Price(100).set_currency("EUR"), adf.Price(100).set_currency("JPY")]
+        with self.assertRaises(ValueError):
+            adf.convert_prices(prices, {"EUR": 1.1}, "USD")
+        # nothing was converted
+        self.assertEqual([p.currency for p in prices], ["EUR", "JPY"])
+
+        with self.assertRaises(ValueError):
+            adf.convert_prices([adf.Price(1)], {"EUR": 1.1}, "USD")
+
+        for rate in ["abc", "Infinity", None]:
+            with self.assertRaises(ValueError):
+                adf.convert_prices([adf.Price(1).set_currency("EUR")], {"EUR": rate}, "USD")
+
+        adf.set_money_quantization(2)
+        prices = [adf.Price(1).set_currency("EUR"), adf.Price(1).set_currency("JPY")]
+        with self.assertRaises(ValueError):
+            adf.convert_prices(prices, {"EUR": 2, "JPY": "1e30"}, "USD")
+        self.assertEqual([p.to_xml().text for p in prices], ["1.00", "1.00"])
+
+    def test_parsed_prices_are_lenient(self):
+        xml = to_bytes(make_prospect()).replace(b'<price type="quote" currency="USD">25000</price>', b'<price type="call"/>')
+        self.assertIn(b'<price type="call"/>', xml)
+        parsed = adf.Adf.from_xml_str(xml)
+        self.assertIsNone(parsed.get_prospect().get_vehicles()[0].get_price().value)
+        self.assertEqual(to_bytes(parsed.get_prospect()), xml)
+
+        xml = to_bytes(make_prospect()).replace(b'type="quote" currency="USD">25000<', b'type="bogus" currency="US$">$19,999<')
+        price = adf.Adf.from_xml_str(xml).get_prospect().get_vehicles()[0].get_price()
+        self.assertEqual((price.value, price.currency, price.type), ("$19,999", None, None))
+        self.assertEqual(price.to_xml().text, "$19,999")
+
+        finance = adf.Vehicle.from_xml(etree.fromstring(
+            b"<vehicle><year>2020</year><make>T</make><model>C</model><finance><method>lease</method>"
+            b"<amount type='monthly'>n/a</amount><balance currency='??'/></finance></vehicle>")).get_finance()
+        self.assertEqual((finance.amounts[0].value, finance.balance.value, finance.balance.currency), ("n/a", None, None))
+
+    def test_convert_unparsed_prices(self):
+        call = adf.Price(0)
+        call.value = None
+        adf.convert_prices([call], {"EUR": 2}, "USD", default_currency="EUR")
+        self.assertIsNone(call.value)
+
+        garbled = adf.Price(0).set_currency("EUR")
+        garbled.value = "$19,999"
+        with self.assertRaises(ValueError):
+            adf.convert_prices([garbled], {"EUR": 2}, "USD")
 
+    def test_vehicle_prices(self):
+        vehicle = make_prospect().get_vehicles()[0]
+        prices = [vehicle.get_price()] + [o.price for o in vehicle.get_options()]
+        adf.convert_prices(prices, {"USD": 2}, "EUR", default_currency="USD")
+        elem = vehicle.to_xml()
+        self.assertEqual((elem.findtext("price"), elem.find("price").get("currency")), ("50000", "EUR"))
+        self.assertEqual(elem.findtext("option/price"), "1800")
 
 
 if __name__ == "__main__":
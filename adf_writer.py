@@ -0,0 +1,181 @@
+from typing import Dict, List, Callable
+from collections import OrderedDict
+from hashlib import blake2b
+import os
+import re
+from lxml import etree
+from adf import Prospect
+
+# writes one adf file per partition (dealer) out of a single mixed stream of prospects.
+# prospects are serialized as they arrive and buffered per partition, files are only kept open for the
+# most recently used partitions, and every file is written under a temporary name and renamed into place on close()
+
+
+
+
+_HEADER = b'<?xml version="1.0" encoding="utf-8"?>\n<adf>\n'
+_FOOTER = b"</adf>\n"
+
+
+# the vendor id if there is one, the vendor name otherwise
+def vendor_key(prospect: Prospect):
+  vendor = prospect.get_vendor()
+  if vendor == None:
+    return None
+
+  if vendor.get_id() != None and vendor.get_id().value:
+    return vendor.get_id().value
+
+  return vendor.get_vendor_name()
+
+
+def _file_name(key: str):
+  safe = re.sub(r"[^A-Za-z0-9._-]", "_", key)
+  if safe != key:
+    # keys that only differ in characters that aren't safe in file names ("dealer 1", "dealer_1") get told apart
+    # by a hash of the real key
+    safe += "-" + blake2b(key.encode("utf-8"), digest_size=4).hexdigest()
+  return safe + ".xml"
+
+
+class _Partition:
+  def __init__(self, path: str):
+    self.path = path
+    self.tmp_path = path + ".tmp"
+    self.buffer: List[bytes] = [_HEADER]
+    self.buffered = len(_HEADER)
+    self.count = 0
+    # the first open truncates any leftover temp file, later ones append
+    self.created = False
+
+
+class PartitionedWriter:
+  def __init__(self,
+               directory: str,
+               key: Callable[[Prospect], str | None] = vendor_key,
+               max_open_files: int = 128,
+               batch_size: int = 64,
+               max_buffered_bytes: int = 64 * 1024 * 1024,
+               transform: Callable | None = None,
+  ):
+    if max_open_files < 1:
+      raise ValueError("max_open_files must be at least 1")
+
+    self.directory = directory
+    self.key = key
+    self.max_open_files = max_open_files
+    self.batch_size = batch_size
+    self.max_buffered_bytes = max_buffered_bytes
+    # applied to every <prospect> element before it's written, e.g. adf_dialects.get_dialect("legacy-miles").apply
+    self.transform = transform
+
+    self.__partitions: Dict[str, _Partition] = {}
+    # file name -> partition key, two partitions writing to one file would overwrite each other
+    self.__file_names: Dict[str, str] = {}
+    # partition key -> open file, least recently used first
+    self.__files: OrderedDict = OrderedDict()
+    self.__buffered = 0
+    self.__closed = False
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc, tb):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
+
+  def __file(self, key: str, partition: _Partition):
+    f = self.__files.get(key)
+    if f is not None:
+      self.__files.move_to_end(key)
+      return f
+
+    if len(self.__files) >= self.max_open_files:
+      _, oldest = self.__files.popitem(last=False)
+      oldest.close()
+
+    f = open(partition.tmp_path, "ab" if partition.created else "wb")
+    partition.created = True
+    self.__files[key] = f
+    return f
+
+  def __flush_partition(self, key: str, partition: _Partition):
+    if len(partition.buffer) == 0:
+      return
+
+    self.__file(key, partition).write(b"".join(partition.buffer))
+    self.__buffered -= partition.buffered
+    partition.buffer = []
+    partition.buffered = 0
+
+  def write(self, prospect: Prospect):
+    if self.__closed:
+      raise ValueError("writer is closed")
+
+    key = self.key(prospect)
+    if not key:
+      raise ValueError("prospect has no partition key")
+
+    partition = self.__partitions.get(key)
+    if partition is None:
+      file_name = _file_name(key)
+      if file_name in self.__file_names:
+        raise ValueError("partition keys " + repr(self.__file_names[file_name]) + " and " + repr(key) + " map to the same file")
+      self.__file_names[file_name] = key
+
+      partition = _Partition(os.path.join(self.directory, file_name))
+      self.__partitions[key] = partition
+      self.__buffered += partition.buffered
+
+    elem = prospect.to_xml()
+    if self.transform is not None:
+      elem = self.transform(elem)
+
+    data = etree.tostring(elem, encoding="utf-8") + b"\n"
+    partition.buffer.append(data)
+    partition.buffered += len(data)
+    partition.count += 1
+    self.__buffered += len(data)
+
+    if len(partition.buffer) >= self.batch_size:
+      self.__flush_partition(key, partition)
+
+    if self.__buffered > self.max_buffered_bytes:
+      self.flush()
+
+  def flush(self):
+    for key, partition in self.__partitions.items():
+      self.__flush_partition(key, partition)
+
+  # number of prospects written so far per partition key
+  def counts(self):
+    return {key: p.count for key, p in self.__partitions.items()}
+
+  def close(self):
+    if self.__closed:
+      return
+    self.__closed = True
+
+    for key, partition in self.__partitions.items():
+      partition.buffer.append(_FOOTER)
+      self.__flush_partition(key, partition)
+
+      f = self.__files.pop(key)
+      f.flush()
+      os.fsync(f.fileno())
+      f.close()
+      os.replace(partition.tmp_path, partition.path)
+
+  # drops everything written so far without touching the final files
+  def abort(self):
+    self.__closed = True
+
+    for f in self.__files.values():
+      f.close()
+    self.__files.clear()
+
+    for partition in self.__partitions.values():
+      if partition.created and os.path.exists(partition.tmp_path):
+        os.remove(partition.tmp_path)
@@ -0,0 +1,72 @@
+import unittest
+import os
+import tempfile
+
+import adf
+from adf_writer import PartitionedWriter, _file_name
+from adf_test import make_prospect
+
+
+def make_lead(dealer, vin):
+    vendor = adf.Vendor(dealer, adf.Contact().add_name(adf.Name("Sales")))
+    return make_prospect(vin=vin).set_vendor(vendor)
+
+
+def read_vins(path):
+    with open(path, "rb") as f:
+        return [p.get_vehicles()[0].get_vin() for p in adf.iter_prospects([f.read()])]
+
+
+class PartitionedWriterTest (unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitions(self):
+        with PartitionedWriter(self.dir, max_open_files=2, batch_size=2) as writer:
+            for i in range(30):
+                writer.write(make_lead("dealer " + str(i % 5), str(i)))
+
+        self.assertEqual(sorted(os.listdir(self.dir)), sorted(_file_name("dealer " + str(i)) for i in range(5)))
+        self.assertEqual(read_vins(os.path.join(self.dir, _file_name("dealer 3"))), [str(i) for i in range(3, 30, 5)])
+
+    def test_similar_keys(self):
+        keys = ["dealer 1", "dealer_1", "M\xfcller Autohaus", "M\xf6ller Autohaus"]
+        with PartitionedWriter(self.dir) as writer:
+            for i, key in enumerate(keys):
+                writer.write(make_lead(key, str(i)))
+
+        self.assertEqual(len(os.listdir(self.dir)), 4)
+        for i, key in enumerate(keys):
+            self.assertEqual(read_vins(os.path.join(self.dir, _file_name(key))), [str(i)])
+
+    def test_vendor_id_key(self):
+        with PartitionedWriter(self.dir) as writer:
+            writer.write(make_prospect())
+        self.assertEqual(os.listdir(self.dir), ["D-1.xml"])
+
+    def test_buffer_limit(self):
+        writer = PartitionedWriter(self.dir, batch_size=1000, max_buffered_bytes=1)
+        writer.write(make_lead("a", "1"))
+        self.assertEqual(os.listdir(self.dir), ["a.xml.tmp"])
+        writer.close()
+        self.assertEqual(read_vins(os.path.join(self.dir, "a.xml")), ["1"])
+
+    def test_abort(self):
+        with self.assertRaises(RuntimeError):
+            with PartitionedWriter(self.dir, batch_size=1) as writer:
+                writer.write(make_lead("a", "1"))
+                raise RuntimeError()
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_missing_key(self):
+        with PartitionedWriter(self.dir) as writer:
+            with self.assertRaises(ValueError):
+                writer.write(adf.Prospect())
+
+
+if __name__ == "__main__":
+    unittest.main()